@@ -42,10 +42,152 @@ def clean(*args, **kwargs):
     remove("sites/test/output")
     remove("sites/demo/output")
     remove("sites/qpid/output")
+    remove("sites/test/.transom")
+    remove("sites/demo/.transom")
+    remove("sites/qpid/.transom")
     remove("htmlcov")
     remove(".coverage")
     remove("README.html")
 
+@command
+def benchmark_templates(iterations=2000):
+    """
+    Time template parsing and rendering, compiled and interpreted
+    """
+    import timeit
+    import types
+
+    from transom.main import ErrorHandling, Template
+
+    # The interpreter that templates used before they were compiled,
+    # kept here as the baseline
+    def parse_pieces(text):
+        pieces = []
+
+        for token in Template._VARIABLE_RE.split(text):
+            if token.startswith("{{{") and token.endswith("}}}"):
+                pieces.append(token[1:-1])
+            elif token.startswith("{{") and token.endswith("}}"):
+                pieces.append((compile(token[2:-2], "<string>", "eval"), repr(token[2:-2])))
+            else:
+                pieces.append(token)
+
+        return pieces
+
+    def render_pieces(pieces, page):
+        for piece in pieces:
+            if type(piece) is tuple:
+                code, token = piece
+
+                with ErrorHandling([page.input_path, token]):
+                    result = eval(code, page.variables)
+
+                if type(result) is types.GeneratorType:
+                    yield from result
+                else:
+                    yield str(result)
+            else:
+                yield piece
+
+    page = types.SimpleNamespace(input_path="benchmark.html", variables={"title": "Benchmark", "prefix": ""},
+                                 site=types.SimpleNamespace(profile=None))
+    text = "<p>{{title}}</p><a href=\"{{prefix}}/index.html\">{{title.upper()}}</a>\n" * 50
+    template = Template(text)
+    pieces = parse_pieces(text)
+
+    if "".join(render_pieces(pieces, page)) != "".join(template.render(page)):
+        fail("The compiled template produced different output")
+
+    def measure(fn, number):
+        return timeit.timeit(fn, number=number) / number * 1_000_000
+
+    parse_times = measure(lambda: parse_pieces(text), iterations // 10), \
+        measure(lambda: Template(text), iterations // 10)
+    render_times = measure(lambda: "".join(render_pieces(pieces, page)), iterations), \
+        measure(lambda: "".join(template.render(page)), iterations)
+
+    print(f"{'':8} {'Interpreted':>12} {'Compiled':>12}   Speedup")
+
+    for name, (interpreted, compiled) in (("Parse:", parse_times), ("Render:", render_times)):
+        print(f"{name:8} {interpreted:9,.1f} us {compiled:9,.1f} us  {interpreted / compiled:7.1f}x")
+
+@command
+def benchmark_markdown(iterations=20):
+    """
+    Time Markdown conversion in each mode using the example sites
+    """
+    import statistics
+    import timeit
+
+    from transom.main import MARKDOWN_MODES
+
+    paths = find(["sites/project", "sites/test"], "*.md")
+    modes = list(MARKDOWN_MODES)
+    times = {}
+
+    for path in paths:
+        text = read(path)
+
+        for mode in modes:
+            convert = MARKDOWN_MODES[mode].value
+
+            if convert(text) != MARKDOWN_MODES["standard"].value(text):
+                fail(f"The {mode} mode produced different output for {path}")
+
+            times[path, mode] = timeit.timeit(lambda: convert(text), number=iterations) / iterations
+
+    # A few long pages dominate the total, so each page is reported,
+    # along with the median speedup
+    width = max(len(x) for x in paths)
+
+    print(f"{'File':{width}}  " + "  ".join(f"{x.capitalize():>10}" for x in modes) + "   Speedup")
+
+    for path in paths:
+        print(f"{path:{width}}  " + "  ".join(f"{times[path, x] * 1_000:7,.2f} ms" for x in modes) +
+              f"  {times[path, 'standard'] / times[path, 'fast']:7.1f}x")
+
+    speedups = [times[x, "standard"] / times[x, "fast"] for x in paths]
+
+    print(f"Median speedup: {statistics.median(speedups):.1f}x")
+
+@command
+def benchmark_loading(files=50_000):
+    """
+    Measure the time and memory to load input files with the Qpid site config
+    """
+    import time
+    import tracemalloc
+
+    from transom.main import TransomSite
+
+    config_dir = get_absolute_path("sites/qpid/config")
+
+    with working_dir():
+        copy(config_dir, "config")
+
+        for i in range(files):
+            write(f"input/section-{i // 100}/page-{i}.md", "# Page\n")
+
+        for i in range(files // 100):
+            write(f"input/section-{i}/index.md", "# Section\n")
+
+        with TransomSite(".", quiet=True) as site:
+            site.load_config_files()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+
+            input_files = site.load_input_files()
+
+            elapsed = time.perf_counter() - start
+            size = tracemalloc.get_traced_memory()[0]
+
+            tracemalloc.stop()
+
+        print(f"Files:  {len(input_files):,}")
+        print(f"Time:   {elapsed:,.2f} s")
+        print(f"Memory: {size / 1_000_000:,.1f} MB ({size / len(input_files):,.0f} bytes per file)")
+
 @command
 def render_readme():
     """
@@ -0,0 +1 @@
+from transom.planocommands import *
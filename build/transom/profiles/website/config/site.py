@@ -0,0 +1 @@
+# Define custom variables and functions for use in {{replaceables}}
@@ -0,0 +1,10 @@
+const $ = document.querySelector.bind(document);
+const $$ = document.querySelectorAll.bind(document);
+
+Element.prototype.$ = function () {
+    return this.querySelector.apply(this, arguments);
+};
+
+Element.prototype.$$ = function () {
+    return this.querySelectorAll.apply(this, arguments);
+};
@@ -0,0 +1,2 @@
+{{include("config/transom/base.js")}}
+{{include("config/transom/components.js")}}
@@ -0,0 +1,6 @@
+site.title = "Transom test"
+
+albert = "Frank"
+
+def benny():
+    return "Agatha"
@@ -0,0 +1,8 @@
+---
+test_string = "\"test\";"
+---
+
+{{include("config/transom/base.js")}}
+{{include("config/transom/components.js")}}
+
+{{test_string}}
@@ -0,0 +1,4664 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import argparse
+import ast
+import asyncio
+import csv
+import ctypes
+import fnmatch
+import gzip
+import hashlib
+import http.server as httpserver
+import html
+import importlib.util
+import io
+import itertools
+import json
+import marshal
+import math
+import mimetypes
+import mistune
+import multiprocessing
+import os
+import re
+import select
+import shutil
+import struct
+import sys
+import threading
+import time
+import traceback
+import types
+import unicodedata
+import urllib.parse
+
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from pathlib import Path
+from queue import Empty, Queue
+
+try:
+    import fcntl
+except ImportError: # pragma: nocover
+    fcntl = None
+
+try:
+    from compression import zstd
+except ImportError: # pragma: nocover
+    zstd = None
+
+__all__ = "TransomError", "TransomSite", "TransomCommand"
+
+class TransomError(Exception):
+    """
+    The standard Transom error.
+    """
+    def __init__(self, message, contexts=None):
+        self.message = message
+        self.contexts = contexts
+
+    def __str__(self):
+        if self.contexts:
+            return "".join(f"{x}: " for x in self.contexts) + str(self.message)
+        else:
+            return str(self.message)
+
+class ErrorHandling:
+    def __init__(self, contexts):
+        self.contexts = contexts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if isinstance(exc_value, TransomError):
+            if not exc_value.contexts:
+                exc_value.contexts = self.contexts
+
+            return False
+
+        if exc_type is not None:
+            raise TransomError(exc_value, self.contexts)
+
+class TransomSite:
+    _SITEMAP_SIZE = 50_000
+    _FEED_SIZE = 50
+
+    def __init__(self, root_dir, verbose=False, quiet=False, threads=8, cache=True, workers="thread"):
+        self.root_dir = Path(root_dir).resolve()
+        self.config_dir = self.root_dir / "config"
+        self.input_dir = self.root_dir / "input"
+        self.output_dir = self.root_dir / "output"
+
+        self.verbose = verbose
+        self.quiet = quiet
+        self.workers = workers
+        self.worker_count = threads
+
+        self.config = SiteConfig(self)
+        self.dependency_graph = DependencyGraph(self)
+        self.asset_manifest = AssetManifest(self)
+        self.search_index = SearchIndex(self)
+        self.render_cache = RenderCache(self, enabled=cache)
+        self.template_cache = TemplateCache(self)
+        self.profile = None
+
+        self.variables = {
+            "site": self.config,
+            "include": include,
+            "load_template": self.template_cache.load_template,
+            "asset_url": self.asset_manifest.url,
+            "convert_markdown": convert_markdown,
+            "strip": strip,
+            "plural": plural,
+            "lipsum": lipsum,
+            "html_escape": html_escape,
+            "html_list": html_list,
+            "html_list_csv": html_list_csv,
+            "html_table": html_table,
+            "html_table_csv": html_table_csv,
+            "site_nav": self.site_nav,
+        }
+
+        threading.current_thread().name = "main-thread"
+
+        self.worker_threads = []
+        self.worker_errors = Queue()
+        self.modified_files = []
+        self.index_files = []
+        self.site_nav_result = None
+        self.minified_sizes = {}
+
+        # The output files the current render has yet to write, or
+        # None while it is still working out which ones
+        self.pending_outputs = set()
+
+        if workers == "thread":
+            for i in range(threads):
+                self.worker_threads.append(WorkerThread(self, f"worker-thread-{i + 1}", self.worker_errors))
+        elif workers != "process":
+            raise TransomError(f"Unknown worker mode: {workers}")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.root_dir))})"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if not self.worker_threads:
+            return
+
+        self.debug("Starting {} worker {}", len(self.worker_threads), plural("thread", len(self.worker_threads)))
+
+        for thread in self.worker_threads:
+            thread.start()
+
+    def stop(self):
+        if not self.worker_threads:
+            return
+
+        self.debug("Stopping worker threads")
+
+        for thread in self.worker_threads:
+            thread.commands.put((None, None))
+            thread.join()
+
+    def load_config_files(self):
+        self.debug("Loading config files in '{}'", self.config_dir)
+
+        site_code_path = self.config_dir / "site.py"
+
+        if site_code_path.exists():
+            self.debug("Executing site code in '{}'", self.config_dir / "site.py")
+
+            with ErrorHandling([site_code_path]):
+                exec(site_code_path.read_text(), self.variables)
+
+        self._ignored_files_re = re.compile \
+            ("|".join([fnmatch.translate(x) for x in self.config.ignored_files] + ["(?!)"]))
+        self._compressed_files_re = re.compile \
+            ("|".join([fnmatch.translate(x) for x in self.config.compressed_files] + ["(?!)"]))
+        self._fingerprinted_files_re = re.compile \
+            ("|".join([fnmatch.translate(x) for x in self.config.fingerprinted_files] + ["(?!)"]))
+
+        if self.config.markdown_mode not in MARKDOWN_MODES:
+            raise TransomError(f"Unknown Markdown mode: {self.config.markdown_mode}")
+
+        for codec in self.config.compression:
+            if codec not in COMPRESSION_CODECS:
+                raise TransomError(f"Unknown compression codec: {codec}")
+
+    def load_input_files(self):
+        self.debug("Loading input files in '{}'", self.input_dir)
+
+        def find_input_files(start_path, input_files, parent_file):
+            def add_input_file(input_path, parent_file):
+                input_file = self.load_input_file(Path(entry.path), parent_file)
+
+                input_files.append(input_file)
+
+                if parent_file is not None:
+                    parent_file.children.append(input_file)
+
+                return input_file
+
+            with os.scandir(start_path) as entries:
+                entries = tuple(x for x in entries if not self._ignored_files_re.match(x.name))
+
+                for entry in entries:
+                    if entry.name in ("index.md", "index.html"):
+                        input_file = add_input_file(Path(entry.path), parent_file)
+                        parent_file = input_file
+                        break
+
+                for entry in entries:
+                    if entry.name in ("index.md", "index.html"):
+                        continue
+
+                    if entry.is_file():
+                        input_file = add_input_file(Path(entry.path), parent_file)
+                    elif entry.is_dir():
+                        find_input_files(entry.path, input_files, parent_file)
+
+        input_files = []
+
+        try:
+            find_input_files(self.input_dir, input_files, None)
+        except FileNotFoundError:
+            self.notice("Input directory not found: {}", self.input_dir)
+
+        # Bundles go last and only with other input files, so the
+        # site title never comes from one
+        if input_files:
+            for name, sources in self.config.bundles.items():
+                input_files.append(BundleFile(self, name, sources))
+
+        self.index_files = [x for x in input_files if x.input_path.name in ("index.md", "index.html")]
+        self.site_nav_result = None
+
+        return input_files
+
+    def site_nav(self) -> str:
+        """
+        Generate site navigation links.  It produces a `<nav>` element
+        with nested lists of links to the index pages of the site.  It
+        is computed once per render and shared by every page.
+        """
+        if self.site_nav_result is None:
+            # In a worker process, only the parents of the pages it
+            # renders are processed up front
+            if (worker := WorkerProcess.INSTANCE) is not None:
+                for input_file in self.index_files:
+                    worker.prepare(input_file, worker.force)
+
+            def list_items(input_files):
+                for input_file in input_files:
+                    sections = sorted((x for x in input_file.children if x in index_files),
+                                      key=lambda x: x.input_path)
+                    items = f"<ul>{''.join(list_items(sections))}</ul>" if sections else ""
+
+                    yield f"<li><a href=\"{input_file.url}\">{input_file.title}</a>{items}</li>"
+
+            index_files = set(self.index_files)
+            roots = [x for x in self.index_files if x.parent is None]
+            nav = f"<nav class=\"transom-site-nav\"><ul>{''.join(list_items(roots))}</ul></nav>"
+
+            self.site_nav_result = nav, tuple(x.input_path for x in self.index_files)
+
+        nav, paths = self.site_nav_result
+
+        for path in paths:
+            record_dependency(path)
+
+        return nav
+
+    @property
+    def state_dir(self):
+        """
+        The directory for the render state of the output directory,
+        such as the dependency graph and the render cache.  It is
+        beside the output directory, so it is not deployed with it.
+        """
+        return self.output_dir.parent / ".transom" / self.output_dir.name
+
+    def load_input_file(self, input_path, parent):
+        self.debug("Loading '{}'", input_path)
+
+        match input_path.suffix:
+            case ".md":
+                input_file = MarkdownPage(self, input_path, parent)
+            case ".css" | ".csv" | ".html" | ".js" | ".json" | ".svg" | ".txt":
+                input_file = TemplatePage(self, input_path, parent)
+            case _:
+                input_file = StaticFile(self, input_path, parent)
+
+        return input_file
+
+    def render(self, force=False):
+        self.notice("Rendering files from '{}' to '{}'", self.input_dir, self.output_dir)
+
+        self.pending_outputs = None
+        self.minified_sizes = {}
+
+        with self.timer(None, "load config"):
+            self.load_config_files()
+
+        with self.timer(None, "load input files"):
+            input_files = self.load_input_files()
+
+        if not input_files:
+            self.pending_outputs = set()
+            return input_files
+
+        with self.timer(None, "load dependencies"):
+            self.dependency_graph.load()
+            self.asset_manifest.load()
+            self.search_index.load(input_files)
+
+        while not self.worker_errors.empty():
+            self.worker_errors.get_nowait()
+
+        if self.workers == "process":
+            modified_files = self.render_with_processes(input_files, force)
+        else:
+            modified_files = self.render_with_threads(input_files, force)
+
+        modified_count = len(modified_files)
+        self.modified_files = modified_files
+        self.pending_outputs = set()
+
+        with self.timer(None, "save state"):
+            self.dependency_graph.save(input_files)
+            self.prune_output_files()
+            self.asset_manifest.save(input_files)
+            self.search_index.save(input_files)
+            self.write_sitemaps(input_files, modified_files)
+            self.render_cache.evict()
+
+        if not self.worker_errors.empty():
+            raise TransomError("Rendering failed")
+
+        unmodified_count = len(input_files) - modified_count
+        unmodified_note = ""
+
+        if unmodified_count > 0:
+            unmodified_note = " ({:,} unchanged)".format(unmodified_count)
+
+        self.notice("Rendered {:,} output {}{}", modified_count, plural("file", modified_count), unmodified_note)
+
+        if self.minified_sizes:
+            minified_count = len(self.minified_sizes)
+            size = sum(x[0] for x in self.minified_sizes.values())
+            saved_size = size - sum(x[1] for x in self.minified_sizes.values())
+
+            self.notice("Minified {:,} output {}, saving {:,} {} ({:.0%})", minified_count,
+                        plural("file", minified_count), saved_size, plural("byte", saved_size),
+                        saved_size / size if size else 0)
+
+        return input_files
+
+    def render_with_threads(self, input_files, force):
+        self.debug("Processing {:,} input {}", len(input_files), plural("file", len(input_files)))
+
+        with self.timer(None, "process"):
+            modified_files = self.process_input_files(input_files, force)
+
+        if self.config.title is None:
+            self.config.title = input_files[0].title
+
+        # The site title can come from the index page, and every page
+        # can use it, so a change means processing the rest as well
+        if not force and self.config.title != self.dependency_graph.site_title:
+            self.debug("Site title changed")
+
+            modified_set = set(modified_files)
+
+            with self.timer(None, "process"):
+                modified_files += self.process_input_files([x for x in input_files if x not in modified_set], True)
+
+        if not force and (dependents := self.find_index_dependents(input_files, modified_files)):
+            with self.timer(None, "process"):
+                modified_files += self.process_input_files(dependents, True)
+
+        modified_count = len(modified_files)
+
+        self.debug("Rendering {:,} output {} to '{}'", modified_count, plural("file", modified_count), self.output_dir)
+
+        self.pending_outputs = {str(x.output_path) for x in modified_files}
+
+        # Fingerprinted assets go first, so the pages rendered after
+        # them get their new URLs
+        if assets := [x for x in modified_files if x.fingerprinted]:
+            all_assets = [x for x in input_files if x.fingerprinted]
+            rendered_assets = assets
+
+            # An asset can use the URL of another, and they render in no
+            # particular order.  Those that got a URL before it changed
+            # render again.  A chain of N assets settles within N rounds,
+            # and a cycle never does, so the rounds are limited.
+            for round_ in range(len(all_assets)):
+                replaced_paths = set(self.asset_manifest.replaced_paths)
+
+                with self.timer(None, "render"):
+                    self.render_output_files(rendered_assets)
+
+                if round_ == len(all_assets) - 1:
+                    break
+
+                if not (rendered_assets := self.find_stale_assets(all_assets, replaced_paths)):
+                    break
+
+                modified_set = set(modified_files)
+                modified_files += [x for x in rendered_assets if x not in modified_set]
+
+                self.pending_outputs.update(str(x.output_path) for x in rendered_assets)
+
+                with self.timer(None, "process"):
+                    self.process_input_files(rendered_assets, True)
+
+            if dependents := self.find_asset_dependents(input_files, modified_files):
+                self.pending_outputs.update(str(x.output_path) for x in dependents)
+
+                with self.timer(None, "process"):
+                    modified_files += self.process_input_files(dependents, True)
+
+        with self.timer(None, "render"):
+            self.render_output_files([x for x in modified_files if not x.fingerprinted])
+
+        return modified_files
+
+    def render_with_processes(self, input_files, force):
+        # Only the site title is needed up front.  The workers
+        # process everything else.
+        input_files[0].process_input(force)
+
+        if self.config.title is None:
+            self.config.title = input_files[0].title
+
+        if not force and self.config.title != self.dependency_graph.site_title:
+            self.debug("Site title changed")
+            force = True
+
+        modified_files = [x for x in input_files if force or self.dependency_graph.is_modified(x)]
+
+        if not force:
+            modified_files += self.find_index_dependents(input_files, modified_files)
+
+        if not modified_files:
+            return modified_files
+
+        self.pending_outputs = {str(x.output_path) for x in modified_files}
+
+        # Fingerprinted assets are rendered here first, so the workers
+        # start with their new URLs
+        if assets := [x for x in modified_files if x.fingerprinted]:
+            all_assets = [x for x in input_files if x.fingerprinted]
+            rendered_assets = assets
+
+            # An asset can use the URL of another, and they render in no
+            # particular order.  Those that got a URL before it changed
+            # render again.  A chain of N assets settles within N rounds,
+            # and a cycle never does, so the rounds are limited.
+            for round_ in range(len(all_assets)):
+                replaced_paths = set(self.asset_manifest.replaced_paths)
+
+                with self.timer(None, "render"):
+                    for input_file in rendered_assets:
+                        try:
+                            input_file.process_input()
+                            input_file.render_output()
+                            input_file.fingerprint_output()
+                            input_file.compress_output()
+                        except TransomError as e:
+                            self.error(str(e))
+                            self.worker_errors.put((input_file, e))
+                            continue
+                        finally:
+                            self.pending_outputs.discard(str(input_file.output_path))
+
+                        self.dependency_graph.update(input_file)
+                        self.search_index.update(input_file)
+
+                if round_ == len(all_assets) - 1:
+                    break
+
+                if not (rendered_assets := self.find_stale_assets(all_assets, replaced_paths)):
+                    break
+
+                modified_set = set(modified_files)
+                modified_files += [x for x in rendered_assets if x not in modified_set]
+
+                self.pending_outputs.update(str(x.output_path) for x in rendered_assets)
+
+            dependents = self.find_asset_dependents(input_files, modified_files)
+
+            self.pending_outputs.update(str(x.output_path) for x in dependents)
+            self.asset_manifest.save(input_files)
+
+            modified_files += dependents
+
+        workers_files = [x for x in modified_files if not x.fingerprinted]
+        workers_count = len(workers_files)
+
+        if not workers_files:
+            return modified_files
+
+        self.debug("Rendering {:,} output {} to '{}' using {} worker {}", workers_count, plural("file", workers_count),
+                   self.output_dir, self.worker_count, plural("process", self.worker_count))
+
+        files_by_path = {str(x.input_path): x for x in workers_files}
+        batches = itertools.batched(files_by_path, max(1, math.ceil(workers_count / (self.worker_count * 4))))
+        args = self.root_dir, self.output_dir, self.verbose, self.quiet, self.render_cache.enabled, \
+            self.profile is not None
+
+        with self.timer(None, "render"), \
+             ProcessPoolExecutor(self.worker_count, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=WorkerProcess.initialize, initargs=args) as executor:
+            for results, profile_data, minified_sizes in executor.map(WorkerProcess.render_input_files, batches,
+                                                                      itertools.repeat(force)):
+                if profile_data is not None:
+                    self.profile.merge(profile_data)
+
+                self.minified_sizes.update(minified_sizes)
+
+                for input_path, title, dependencies, terms, error in results:
+                    input_file = files_by_path[input_path]
+                    self.pending_outputs.discard(str(input_file.output_path))
+
+                    if error is not None:
+                        self.worker_errors.put((input_file, TransomError(error)))
+                        continue
+
+                    if isinstance(input_file, TemplatePage):
+                        input_file.config.title = title
+
+                    input_file.dependencies = set(dependencies)
+                    self.dependency_graph.update(input_file)
+                    self.search_index.update(input_file, terms)
+
+        return modified_files
+
+    def find_stale_assets(self, assets, replaced_paths):
+        """
+        Return the assets whose last render used an asset URL that
+        changed after `replaced_paths` was taken.
+        """
+        changed_paths = self.asset_manifest.replaced_paths - replaced_paths
+
+        if not changed_paths:
+            return []
+
+        return [x for x in assets if self.dependency_graph.depends_on(x, changed_paths)]
+
+    def find_index_dependents(self, input_files, modified_files):
+        """
+        Return the unmodified files whose last render used an index
+        page, if index pages have been added or removed.  The site
+        navigation and the parents of pages depend on the set of index
+        pages, not only on their content.
+        """
+        index_paths = {str(x.input_path) for x in self.index_files}
+
+        if index_paths == self.dependency_graph.index_paths:
+            return []
+
+        self.debug("Index files changed")
+
+        paths = index_paths | self.dependency_graph.index_paths
+        modified_set = set(modified_files)
+
+        return [x for x in input_files if x not in modified_set and self.dependency_graph.depends_on(x, paths)]
+
+    def find_asset_dependents(self, input_files, modified_files):
+        """
+        Return the unmodified files whose last render used an asset
+        URL that has since changed.
+        """
+        replaced_paths = self.asset_manifest.replaced_paths
+
+        if not replaced_paths:
+            return []
+
+        modified_set = set(modified_files)
+
+        return [x for x in input_files
+                if x not in modified_set and self.dependency_graph.depends_on(x, replaced_paths)]
+
+    # The worker threads pull files from a shared queue as they free
+    # up, so a run of expensive files doesn't hold up the others
+    def process_input_files(self, input_files, force=False):
+        work = Queue()
+        modified_file_lists = tuple([] for x in self.worker_threads)
+
+        for input_file in input_files:
+            work.put(input_file)
+
+        for thread, modified_files in zip(self.worker_threads, modified_file_lists):
+            thread.commands.put((thread.process_input_files, (work, force, modified_files)))
+
+        self.await_worker_threads("Processed")
+
+        return list(itertools.chain.from_iterable(modified_file_lists))
+
+    def render_output_files(self, modified_files):
+        work = Queue()
+
+        for input_file in modified_files:
+            work.put(input_file)
+
+        for thread in self.worker_threads:
+            thread.commands.put((thread.render_output_files, (work,)))
+
+        self.await_worker_threads("Rendered")
+
+    def await_worker_threads(self, verb):
+        for thread in self.worker_threads:
+            thread.commands.join()
+
+        if self.verbose:
+            for thread in self.worker_threads:
+                self.debug("{} {} {:,} {} in {:.3f}s", thread.name, verb.lower(), thread.file_count,
+                           plural("file", thread.file_count), thread.busy_time)
+
+    def prune_output_files(self):
+        """
+        Remove the output files of input files that have gone away,
+        along with their compressed and fingerprinted copies and any
+        directories left empty.  The dependency graph records every
+        output, so unchanged files cost nothing here.
+        """
+        output_dir = str(self.output_dir)
+        removed_count = 0
+
+        for path in sorted(self.dependency_graph.removed_paths):
+            # Entries from an output directory at another location are
+            # not ours to remove
+            if not path.startswith(output_dir + os.sep):
+                continue
+
+            self.debug("Removing stale output file '{}'", path)
+
+            output_path = Path(path)
+
+            self.asset_manifest.remove(output_path)
+            remove_output(output_path)
+
+            removed_count += 1
+
+            for dir_path in output_path.parents:
+                if str(dir_path) == output_dir:
+                    break
+
+                try:
+                    dir_path.rmdir()
+                except OSError:
+                    break
+
+        if removed_count:
+            self.notice("Removed {:,} stale output {}", removed_count, plural("file", removed_count))
+
+    def write_sitemaps(self, input_files, modified_files):
+        """
+        Write the sitemap and the Atom feeds, if the site has them.
+        Each is written again only when one of its pages has been
+        added, removed, or rendered again.
+        """
+        config = self.config
+
+        if not config.sitemap and not config.feeds:
+            return
+
+        if config.url is None:
+            raise TransomError("Sitemaps and feeds require site.url")
+
+        pages = [x for x in input_files if isinstance(x, TemplatePage) and x.output_path.suffix == ".html"]
+        changed_paths = {x for x in itertools.chain((str(y.output_path) for y in modified_files),
+                                                    self.dependency_graph.removed_paths) if x.endswith(".html")}
+
+        if config.sitemap and (changed_paths or not (self.output_dir / "sitemap.xml").exists()):
+            self.debug("Writing the sitemap")
+            self.write_sitemap(pages)
+
+        for feed_dir in config.feeds:
+            dir_path = self.output_dir / feed_dir
+            prefix = str(dir_path) + os.sep
+            feed_path = dir_path / "feed.xml"
+
+            if feed_path.exists() and not any(x.startswith(prefix) for x in changed_paths):
+                continue
+
+            self.debug("Writing the feed for '{}'", feed_dir)
+            self.write_feed(feed_path, [x for x in pages if str(x.output_path).startswith(prefix)])
+
+    def write_sitemap(self, pages):
+        """
+        Write `sitemap.xml`.  Beyond 50,000 pages, it is a sitemap
+        index pointing to `sitemap-1.xml`, `sitemap-2.xml`, and so on.
+        """
+        base_url = self.config.url.rstrip("/")
+        entries = sorted((base_url + x.url, self.dependency_graph.mtime(str(x.input_path))) for x in pages)
+        chunks = [entries[i:i + self._SITEMAP_SIZE] for i in range(0, len(entries), self._SITEMAP_SIZE)]
+        sitemap_paths = []
+
+        def urlset(entries):
+            yield "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+            yield "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n"
+
+            for url, mtime in entries:
+                yield f"<url><loc>{html.escape(url)}</loc><lastmod>{w3c_datetime(mtime)}</lastmod></url>\n"
+
+            yield "</urlset>\n"
+
+        def sitemapindex(paths):
+            yield "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+            yield "<sitemapindex xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n"
+
+            for path in paths:
+                yield f"<sitemap><loc>{html.escape(base_url + self.config.prefix)}/{path.name}</loc></sitemap>\n"
+
+            yield "</sitemapindex>\n"
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        if len(chunks) <= 1:
+            self.write_generated_file(self.output_dir / "sitemap.xml", urlset(entries))
+        else:
+            for i, chunk in enumerate(chunks, 1):
+                sitemap_paths.append(self.output_dir / f"sitemap-{i}.xml")
+                self.write_generated_file(sitemap_paths[-1], urlset(chunk))
+
+            self.write_generated_file(self.output_dir / "sitemap.xml", sitemapindex(sitemap_paths))
+
+        # Remove the parts of a larger sitemap, and their compressed
+        # copies
+        sitemap_names = {x.name for x in sitemap_paths}
+
+        for path in self.output_dir.glob("sitemap-*.xml*"):
+            if path.name.partition(".xml")[0] + ".xml" not in sitemap_names:
+                path.unlink()
+
+    def write_feed(self, feed_path, pages):
+        """
+        Write an Atom feed of the newest of `pages` to `feed_path`.
+        The feed takes its title from the index page of its
+        directory.
+        """
+        base_url = self.config.url.rstrip("/")
+        index_path = feed_path.with_name("index.html")
+        index_page = next((x for x in pages if x.output_path == index_path), None)
+        # Worker processes leave unchanged pages unprocessed, so the
+        # titles come from the dependency graph
+        titles = {x: plain_text(self.dependency_graph.entries.get(str(x.output_path), {}).get("title")) for x in pages}
+        title = titles.get(index_page) or plain_text(self.config.title)
+        entries = sorted(((self.dependency_graph.mtime(str(x.input_path)), x) for x in pages if x is not index_page),
+                         key=lambda x: (-x[0], x[1].url))[:self._FEED_SIZE]
+        feed_url = base_url + self.config.prefix + "/" + feed_path.relative_to(self.output_dir).as_posix()
+        updated = max((x[0] for x in entries), default=0)
+
+        def feed():
+            yield "<?xml version=\"1.0\" encoding=\"utf-8\"?>\n"
+            yield "<feed xmlns=\"http://www.w3.org/2005/Atom\">\n"
+            yield f"<title>{html.escape(title or '')}</title>\n"
+            yield f"<link href=\"{html.escape(feed_url)}\" rel=\"self\"/>\n"
+
+            if index_page is not None:
+                yield f"<link href=\"{html.escape(base_url + index_page.url)}\"/>\n"
+
+            yield f"<id>{html.escape(feed_url)}</id>\n"
+            yield f"<updated>{w3c_datetime(updated)}</updated>\n"
+            yield f"<author><name>{html.escape(plain_text(self.config.title) or '')}</name></author>\n"
+
+            for mtime, page in entries:
+                url = html.escape(base_url + page.url)
+
+                yield "<entry>"
+                yield f"<title>{html.escape(titles[page] or page.url)}</title>"
+                yield f"<link href=\"{url}\"/><id>{url}</id><updated>{w3c_datetime(mtime)}</updated>"
+                yield "</entry>\n"
+
+            yield "</feed>\n"
+
+        feed_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.write_generated_file(feed_path, feed())
+
+    def write_generated_file(self, path, chunks):
+        """
+        Write an output file that has no input file, and compress it
+        if the site is set to.
+        """
+        write_output(path, chunks)
+
+        if self.config.compression and self._compressed_files_re.match(path.name):
+            compress_file(path, self.config)
+
+    def check_links(self):
+        """
+        Check the links in the HTML output files.  A local link must
+        point to an output file, and its fragment, if any, to an
+        element ID in that file.  It returns the broken links as
+        (path, line, URL, problem) tuples.
+        """
+        self.notice("Checking links in '{}'", self.output_dir)
+
+        self.load_config_files()
+
+        output_dir = str(self.output_dir)
+        dir_paths, file_paths, html_paths = {output_dir}, set(), []
+
+        for dir_path, dir_names, file_names in os.walk(output_dir):
+            dir_paths.update(os.path.join(dir_path, x) for x in dir_names)
+
+            for name in file_names:
+                file_path = os.path.join(dir_path, name)
+                file_paths.add(file_path)
+
+                if name.endswith(".html"):
+                    html_paths.append(file_path)
+
+        if self.workers == "process":
+            batches = itertools.batched(html_paths, max(1, math.ceil(len(html_paths) / (self.worker_count * 4))))
+
+            with ProcessPoolExecutor(self.worker_count, mp_context=multiprocessing.get_context("spawn")) as executor:
+                scans = list(itertools.chain.from_iterable(executor.map(scan_html_files, batches)))
+        else:
+            work = Queue()
+            scan_lists = tuple([] for x in self.worker_threads)
+
+            for html_path in html_paths:
+                work.put(html_path)
+
+            for thread, scans in zip(self.worker_threads, scan_lists):
+                thread.commands.put((thread.scan_html_files, (work, scans)))
+
+            self.await_worker_threads("Scanned")
+
+            scans = list(itertools.chain.from_iterable(scan_lists))
+
+        ids = {x[0]: set(x[1]) for x in scans}
+        prefix = self.config.prefix
+        targets = {}
+        broken_links = []
+        link_count = 0
+
+        # Most links, such as those in navigation, repeat across the
+        # files of a directory, so they are resolved once per
+        # directory
+        def resolve(base_dir, url):
+            parts = urllib.parse.urlsplit(url)
+
+            if parts.scheme or parts.netloc:
+                return None
+
+            link_path = urllib.parse.unquote(parts.path)
+            fragment = urllib.parse.unquote(parts.fragment)
+
+            if not link_path:
+                target_path = None
+            elif link_path.startswith("/"):
+                # Links outside the prefix are outside the site
+                if prefix and link_path != prefix and not link_path.startswith(prefix + "/"):
+                    return None
+
+                target_path = os.path.normpath(output_dir + "/" + link_path[len(prefix):])
+            else:
+                target_path = os.path.normpath(os.path.join(base_dir, link_path))
+
+            if target_path in dir_paths:
+                target_path = os.path.join(target_path, "index.html")
+
+            return target_path, fragment
+
+        for html_path, _, links in sorted(scans):
+            base_dir = os.path.dirname(html_path)
+
+            for line, url in links:
+                try:
+                    target = targets[base_dir, url]
+                except KeyError:
+                    target = targets[base_dir, url] = resolve(base_dir, url)
+
+                if target is None:
+                    continue
+
+                link_count += 1
+                target_path, fragment = target
+
+                if target_path is None:
+                    target_path = html_path
+
+                if target_path not in file_paths:
+                    problem = "Broken link"
+                elif fragment and target_path in ids and fragment not in ids[target_path]:
+                    problem = "Broken anchor"
+                else:
+                    continue
+
+                broken_links.append((html_path, line, url, problem))
+
+        for html_path, line, url, problem in broken_links:
+            self.notice("{}:{}: {}: {}", os.path.relpath(html_path), line, problem, url)
+
+        broken_count = len(broken_links)
+
+        self.notice("Checked {:,} {} in {:,} {} ({:,} broken)", link_count, plural("link", link_count),
+                    len(html_paths), plural("file", len(html_paths)), broken_count)
+
+        return broken_links
+
+    def timer(self, input_file, step):
+        """
+        Time a step of rendering `input_file`, or a site phase if
+        `input_file` is None.  It does nothing unless profiling is on.
+        """
+        if self.profile is None:
+            return NULL_TIMER
+
+        return self.profile.timer(input_file, step)
+
+    def serve(self, port=8080, live_reload=False, server="thread"):
+        self.notice("Serving the site at http://localhost:{}", port)
+
+        match server:
+            case "thread":
+                server_class = Server
+            case "async":
+                server_class = AsyncServer
+            case _:
+                raise TransomError(f"Unknown server mode: {server}")
+
+        try:
+            with server_class(self, port, live_reload=live_reload) as instance:
+                instance.serve_forever()
+        except OSError as e:
+            # OSError: [Errno 98] Address already in use
+            if e.errno == 98:
+                raise TransomError(f"Port {port} is already in use")
+            else: # pragma: nocover
+                raise
+
+    def log(self, message, *args):
+        if self.verbose:
+            message = f"{colorize(threading.current_thread().name, '90')} {message}"
+
+        print(message.format(*args), file=sys.stderr, flush=True)
+
+    def debug(self, message, *args):
+        if self.verbose:
+            self.log(colorize(f"debug: {message}", "37"), *args)
+
+    def notice(self, message, *args):
+        if not self.quiet:
+            message = f"{colorize('notice:', '36')} {message}" if self.verbose else message
+            self.log(message, *args)
+
+    def error(self, message, *args):
+        if self.verbose:
+            traceback.print_exc()
+
+        self.log(f"{colorize('error:', '31;1')} {message}", *args)
+
+@dataclass
+class SiteConfig:
+    _site: TransomSite
+
+    title: str = None
+    """
+    The site title.  XXX Used in head/title element (so, in bookmarks).
+    """
+
+    prefix: str = ""
+    """
+    A string prefix used in generated links. It is
+    inserted before the file path. This is important when the
+    published site lives under a directory prefix, as is the case for
+    GitHub Pages. The default is the empty string, meaning no prefix.
+    """
+
+    ignored_files: list[str] = field(default_factory=lambda: [".git", ".#*", "#*"])
+    """
+    A list of shell globs for excluding input and config files from
+    processing. The default is `[".git", ".#*","#*"]`.
+    """
+
+    copy_strategy: str = "copy"
+    """
+    How static files are placed in the output directory.  `"copy"`
+    copies them.  `"hardlink"` and `"symlink"` link to the input
+    files.  `"reflink"` makes a copy-on-write clone where the file
+    system supports it and copies otherwise.  Existing identical
+    outputs are left untouched.  The default is `"copy"`.
+    """
+
+    cache_dir: str = None
+    """
+    The directory for cached Markdown conversions and parsed
+    templates.  The default is `None`, meaning `cache` under the
+    state directory.
+    """
+
+    cache_size: int = 100 * 1024 * 1024
+    """
+    The maximum size in bytes of the cache directory.  The least
+    recently used entries are removed when the cache grows beyond it.
+    The default is 100 MiB.
+    """
+
+    markdown_mode: str = "standard"
+    """
+    How Markdown is converted.  `"fast"` adds the mistune speedup
+    rules for paragraphs and plain text and renders through a
+    dispatch table.  It produces the same HTML for ordinary pages, but
+    it may differ from `"standard"` in corner cases of the CommonMark
+    spec.  The default is `"standard"`.
+    """
+
+    bundles: dict[str, list[str]] = field(default_factory=dict)
+    """
+    CSS and JavaScript output files made by joining source files,
+    keyed by output path.  For example, `{"bundle.css":
+    ["config/base.css", "config/theme.css"]}`.  Source paths are
+    relative to the site directory, and their order is kept.  Local
+    CSS `@import` rules are replaced by the imported files.  A bundle
+    is rendered again only when one of its files changes.  Relative
+    CSS `url()` references are rewritten for the location of the
+    bundle.  The default is `{}`.
+    """
+
+    minify: bool = False
+    """
+    If true, strip comments and needless whitespace from HTML, CSS,
+    and JavaScript output files.  Minifying needs the whole file, so
+    these pages are built in memory instead of streamed to the output
+    file.  The default is `False`.
+    """
+
+    fingerprinted_files: list[str] = field(default_factory=list)
+    """
+    A list of shell globs for output files that also get a copy with
+    a hash of their content in the file name, such as
+    `site.3f2a1b9c0d4e5f67.css`.  `asset_url("site.css")` gives the
+    URL of the copy.  Since any change makes a new name, the copies
+    can be cached for a long time.  Pages using an asset URL are
+    rendered again when it changes.  The default is `[]`.
+    """
+
+    compression: list[str] = field(default_factory=list)
+    """
+    Codecs for precompressed copies of output files, written next to
+    them for servers such as nginx to send as is.  `"gzip"` writes
+    `.gz` files.  `"zstd"` writes `.zst` files, where Python provides
+    it.  The default is `[]`, meaning no precompression.
+    """
+
+    compressed_files: list[str] = field(default_factory=lambda: ["*.html", "*.css", "*.js", "*.json", "*.svg",
+                                                                 "*.txt", "*.xml", "*.csv"])
+    """
+    A list of shell globs for the output files worth compressing.  The
+    default matches the common text formats.
+    """
+
+    compression_threshold: int = 1024
+    """
+    The size in bytes below which output files are not compressed.
+    The default is 1 KiB.
+    """
+
+    url: str = None
+    """
+    The scheme and host of the published site, such as
+    `https://example.org`, for the absolute URLs in sitemaps and
+    feeds.  The prefix goes after it.  The default is `None`.
+    """
+
+    sitemap: bool = False
+    """
+    If true, write `sitemap.xml` listing the HTML pages of the site.
+    It requires `url`.  The default is `False`.
+    """
+
+    feeds: list[str] = field(default_factory=list)
+    """
+    Output directories, such as `"blog"`, that get an Atom feed named
+    `feed.xml` of their newest pages.  The feed title is the title of
+    the directory's index page.  It requires `url`.  The default is
+    `[]`.
+    """
+
+    search_index: bool = False
+    """
+    If true, build a full-text index of the HTML and Markdown pages
+    for client-side search.  The index is written as JSON files under
+    `_transom/search` in the output directory, for use by the search
+    component in `config/transom/components.js`.  The component looks
+    for the index beside the site script, or at the URL in the
+    `data-index` attribute of the search input.  Only the literal
+    text of the pages is indexed, not the output of their template
+    expressions.  The default is `False`.
+    """
+
+    cache_control: dict[str, str] = field(default_factory=lambda: {"*": "no-cache"})
+    """
+    `Cache-Control` header values for files served by `transom
+    serve`, keyed by shell glob of the file path.  The first matching
+    glob wins.  The default is `{"*": "no-cache"}`, meaning browsers
+    check with the server, which answers 304 if the file is
+    unchanged, before using a cached copy.
+    """
+
+    @property
+    def config_dir(self):
+        return self._site.config_dir
+
+    @property
+    def input_dir(self):
+        return self._site.input_dir
+
+    @property
+    def output_dir(self):
+        return self._site.output_dir
+
+class InputFile:
+    __slots__ = "site", "input_path", "output_path", "url", "parent", "children", "dependencies", "path_links_result"
+
+    def __init__(self, site, input_path, parent):
+        self.site = site
+        self.input_path = input_path
+
+        # Path.relative_to is surprisingly slow in Python 3.12, so we
+        # avoid it here
+        output_path = str(self.input_path)[len(str(self.site.input_dir)) + 1:]
+
+        if output_path.endswith(".md"):
+            output_path = output_path[:-3] + ".html"
+
+        self.output_path = self.site.output_dir / output_path
+
+        self.url = f"{self.site.config.prefix}/{output_path}"
+        self.parent = parent
+        self.children = []
+        self.dependencies = set()
+        self.path_links_result = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.input_path))})"
+
+    @property
+    def title(self):
+        return self.output_path.name
+
+    @property
+    def parents(self):
+        """
+        The ancestor index files of this file, nearest ancestor first.
+        """
+        parent = self.parent
+
+        while parent is not None:
+            yield parent
+            parent = parent.parent
+
+    def path_links(self):
+        """
+        The links to this file and its ancestors, top-level ancestor
+        first.  Index files keep their links, so the pages below them
+        share them until a title in the chain changes.
+        """
+        parent_links = () if self.parent is None else self.parent.path_links()
+        title = self.title
+
+        if (result := self.path_links_result) is not None and result[0] is parent_links and result[1] == title:
+            return result[2]
+
+        links = parent_links + (f"<a href=\"{self.url}\">{title}</a>",)
+
+        if self.children:
+            self.path_links_result = parent_links, title, links
+
+        return links
+
+    def process_input(self, force=True):
+        self.debug("Processing input")
+
+        with self.site.timer(self, "stat"):
+            modified = force or self.site.dependency_graph.is_modified(self)
+
+        if modified:
+            self.dependencies = {str(self.input_path)}
+
+        return modified
+
+    def render_output(self):
+        self.debug("Rendering output")
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_text(self, text):
+        """
+        Write `text` to the output file, minified if the site is set
+        to minify it.
+        """
+        if not self.site.config.minify or self.output_path.suffix not in MINIFIERS:
+            with self.site.timer(self, "write"):
+                write_output(self.output_path, (text,))
+
+            return
+
+        with self.site.timer(self, "minify"):
+            minified_text = self.site.render_cache.minify(self.output_path.suffix, text)
+
+        with self.site.timer(self, "write"):
+            write_output(self.output_path, (minified_text,))
+
+        self.site.minified_sizes[str(self.output_path)] = len(text.encode()), len(minified_text.encode())
+
+    @property
+    def fingerprinted(self):
+        return self.site._fingerprinted_files_re.match(self.output_path.name) is not None
+
+    def fingerprint_output(self):
+        if self.fingerprinted:
+            self.site.asset_manifest.add(self)
+
+    def compress_output(self):
+        """
+        Write a compressed copy of the output file, and of its
+        fingerprinted copy if any, for each configured codec.  A copy
+        at least as new as its file is kept as is.
+        """
+        config = self.site.config
+
+        if not config.compression or not self.site._compressed_files_re.match(self.output_path.name):
+            return
+
+        with self.site.timer(self, "compress"):
+            for output_path in (self.output_path, self.site.asset_manifest.get_path(self)):
+                if output_path is not None:
+                    compress_file(output_path, config)
+
+    def debug(self, message, *args):
+        self.site.debug(f"{self.input_path}: {message}", *args)
+
+class StaticFile(InputFile):
+    __slots__ = ()
+
+    def render_output(self):
+        super().render_output()
+
+        with self.site.timer(self, "write"):
+            place_file(self.input_path, self.output_path, self.site.config.copy_strategy)
+
+class BundleFile(InputFile):
+    """
+    An output file joined from the source files of a bundle in
+    `site.bundles`.  It has no input file of its own.
+    """
+    __slots__ = "sources",
+
+    def __init__(self, site, name, sources):
+        super().__init__(site, site.input_dir / name, None)
+
+        self.sources = sources
+
+        if self.output_path.suffix not in (".css", ".js"):
+            raise TransomError(f"Bundle '{name}' is not a CSS or JavaScript file")
+
+        if self.input_path.exists():
+            raise TransomError(f"Bundle '{name}' conflicts with an input file")
+
+    def render_output(self):
+        super().render_output()
+
+        with DependencyTracking(self):
+            record_dependency(self.site.config_dir / "site.py")
+
+            with self.site.timer(self, "render"), ErrorHandling([self.output_path]):
+                paths = [self.site.root_dir / x for x in self.sources]
+
+                if self.output_path.suffix == ".css":
+                    text = bundle_css(paths, self.input_path.parent)
+                else:
+                    text = bundle_js(paths)
+
+            self.write_text(text)
+
+class TemplatePage(InputFile):
+    __slots__ = "config", "_variables", "template"
+    _HEADER_RE = re.compile(r"(?s)^---\s*\n(.*?)\n---\s*\n")
+    _TITLE_RE = re.compile(r"(?si)<(?:h1|h2)\b[^>]*>(.*?)</(?:h1|h2)>")
+
+    def __init__(self, site, input_path, parent):
+        super().__init__(site, input_path, parent)
+
+        self.config = PageConfig(self)
+        self._variables = None
+
+    @property
+    def variables(self):
+        """
+        The Python environment of this page.  It is a copy of the site
+        variables, made when the page is first processed or rendered,
+        so unchanged pages don't carry one.
+        """
+        if self._variables is None:
+            variables = self.site.variables | {
+                "page": self.config,
+                "path_nav": self.path_nav,
+                "render_template": self.render_template,
+            }
+
+            try:
+                variables["toc_nav"] = self.toc_nav
+            except AttributeError:
+                pass
+
+            self._variables = variables
+
+        return self._variables
+
+    @property
+    def title(self):
+        return self.config.title
+
+    def process_input(self, force=True):
+        modified = super().process_input(force)
+
+        if not modified:
+            self.config.title = self.site.dependency_graph.get_title(self)
+            return modified
+
+        with DependencyTracking(self):
+            record_dependency(self.site.config_dir / "site.py")
+
+            with self.site.timer(self, "read"):
+                code, text = None, self.input_path.read_text()
+
+            if match_ := TemplatePage._HEADER_RE.match(text):
+                code, text = match_.group(1), text[match_.end():]
+
+            if self.output_path.suffix == ".html":
+                if match_ := TemplatePage._TITLE_RE.search(text):
+                    self.config.title = match_.group(1)
+
+            if code:
+                self.debug("Executing page code")
+
+                with self.site.timer(self, "header"), ErrorHandling([self.input_path, "header"]):
+                    exec(code, self.variables)
+
+            self.process_template(text)
+
+        return modified
+
+    def process_template(self, text):
+        with self.site.timer(self, "parse"):
+            self.template = Template(text, self.input_path, self.site.render_cache)
+
+    def render_output(self):
+        super().render_output()
+
+        with DependencyTracking(self):
+            if not self.site.config.minify or self.output_path.suffix not in MINIFIERS:
+                with self.site.timer(self, "render"):
+                    self.template.write(self)
+            else:
+                with self.site.timer(self, "render"):
+                    text = "".join(self.template.render(self))
+
+                self.write_text(text)
+
+        # The environment is made again if the page is processed again
+        self._variables = None
+
+    def search_text(self):
+        """
+        Return the literal text of the page content, without its
+        template expressions, for the search index.
+        """
+        return "".join(self.template.texts)
+
+    def path_nav(self, start=0, end=None, min=1) -> str:
+        """
+        Generate context navigation links.  It produces a `<nav>`
+        element with links to the parents of this page.  `start` and
+        `end` trim off parts you don't need.  If the resulting number
+        of links is less than `min`, it returns empty string.
+        """
+        files = (*reversed(tuple(self.parents)), self)[start:end]
+        links = self.path_links()[start:end]
+
+        for file_ in files:
+            if file_ is not self:
+                record_dependency(file_.input_path)
+
+        if len(links) < min:
+            return ""
+
+        return f"<nav class=\"transom-page-path\">{''.join(links)}</nav>"
+
+    def render_template(self, path) -> Iterator[str]:
+        """
+        Load the template at `path` and render it using the Python
+        environment of this page.
+        """
+        return self.site.template_cache.load_template(path).render(self)
+
+class MarkdownPage(TemplatePage):
+    __slots__ = "content", "headings"
+
+    def process_template(self, text):
+        with self.site.timer(self, "markdown"):
+            self.content, self.headings = self.site.render_cache.convert_markdown(text)
+
+        with self.site.timer(self, "parse"):
+            layout = self.site.template_cache.load_layout(self.config.page_template, self.config.body_template)
+            content = Template(self.content, self.input_path, self.site.render_cache)
+
+        self.template = PageTemplate(layout, content)
+
+    def search_text(self):
+        return "".join(self.template.content.texts)
+
+    def toc_nav(self, levels=2) -> str:
+        """
+        Generate a table of contents.  It produces a `<nav>`
+        element with links to the headings in the content of this
+        page, down to heading level `levels`.  Links to headings
+        below level 2 have the class `level-<n>`.
+        """
+        links = []
+
+        for level, id_, text in self.headings:
+            if level > levels:
+                continue
+
+            class_attr = f" class=\"level-{level}\"" if level > 2 else ""
+            links.append(f"<a href=\"#{id_}\"{class_attr}>{re.sub(r'<[^>]*>', '', text)}</a>")
+
+        return f"<nav class=\"transom-page-toc\">{''.join(links)}</nav>"
+
+@dataclass
+class PageConfig:
+    _page: TemplatePage
+
+    title: str = None
+    """
+    The title of this file.  Default title values are extracted from
+    Markdown or HTML content.
+    """
+
+    page_template: str = "config/page.html"
+    """
+    The top-level template object for the page.  The page template
+    wraps `@body@`, the body template.  The default is
+    `config/page.html`.  XXX null means.
+    """
+
+    body_template: str = "config/body.html"
+    """
+    The template object for the body element of the page.  The body
+    element wraps `@content@`, the page content.  The default is
+    `config/body.html`.  XXX null means.
+    """
+
+    @property
+    def input_path(self):
+        return self._page.input_path
+
+    @property
+    def output_path(self):
+        return self._page.output_path
+
+    @property
+    def url(self):
+        return self._page.url
+
+class Template:
+    """
+    A template compiled to a single Python generator function.  The
+    function yields the literal text and the result of each `{{...}}`
+    expression in order.  `lines` maps each line of the generated
+    code to the expression token it came from, for error reporting.
+    """
+    __slots__ = "code", "texts", "lines", "context"
+    _VARIABLE_RE = re.compile(r"(\{\{\{.+?\}\}\}|\{\{.+?\}\})")
+
+    def __init__(self, text, context=None, cache=None):
+        self.context = context
+
+        if cache is None:
+            self.code, self.texts, self.lines = self._parse(text)
+        else:
+            self.code, self.texts, self.lines = cache.parse_template(self, text)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.context))})"
+
+    def _parse(self, text):
+        source = ["def template(_transom_texts, _transom_results):"]
+        texts = []
+        lines = [None, None]
+        assigned_names = set()
+
+        def add(line, token=None):
+            source.append(line)
+            lines.append(token)
+
+        def add_text(text):
+            add(f"    yield _transom_texts[{len(texts)}]")
+            texts.append(text)
+
+        for token in Template._VARIABLE_RE.split(text):
+            if token.startswith("{{{") and token.endswith("}}}"):
+                add_text(token[1:-1])
+            elif token.startswith("{{") and token.endswith("}}"):
+                code = token[2:-2]
+                token = repr(code)
+
+                # Check each expression on its own, so syntax errors
+                # point at the offending token and nothing can escape
+                # the generated call
+                try:
+                    compile(code, "<string>", "eval")
+                except Exception as e:
+                    raise TransomError(e, [self.context, token])
+
+                # Names bound with := go to the page variables, as they
+                # would with eval
+                if ":=" in code:
+                    assigned_names.update(x.target.id for x in ast.walk(ast.parse(code, mode="eval"))
+                                          if isinstance(x, ast.NamedExpr))
+
+                # The extra parentheses keep a tuple expression a single
+                # argument
+                if "#" in code:
+                    # Keep a trailing comment from swallowing the
+                    # closing parentheses
+                    add("    yield from _transom_results((", token)
+                    add(code, token)
+                    add("    ))", token)
+                else:
+                    add(f"    yield from _transom_results(({code}))", token)
+            elif token:
+                add_text(token)
+
+        add("    yield from ()")
+
+        if assigned_names:
+            source.insert(1, f"    global {', '.join(sorted(assigned_names))}")
+            lines.insert(2, None)
+
+        module = compile("\n".join(source), str(self.context), "exec")
+        code = next(x for x in module.co_consts if isinstance(x, types.CodeType))
+
+        return code, tuple(texts), tuple(lines)
+
+    @staticmethod
+    def _results(result):
+        return result if type(result) is types.GeneratorType else (str(result),)
+
+    def _error_contexts(self, input_file, traceback_):
+        token = None
+
+        # The innermost frame of the generated function has the line
+        # of the failing expression
+        while traceback_ is not None:
+            if traceback_.tb_frame.f_code is self.code:
+                token = self.lines[traceback_.tb_lineno]
+
+            traceback_ = traceback_.tb_next
+
+        return [input_file.input_path] if token is None else [input_file.input_path, token]
+
+    def render(self, input_file):
+        fn = types.FunctionType(self.code, input_file.variables, "template", (self.texts, Template._results))
+
+        try:
+            if input_file.site.profile is None:
+                yield from fn()
+            else:
+                yield from self._render_profiled(fn(), input_file.site.profile)
+        except TransomError as e:
+            if not e.contexts:
+                e.contexts = self._error_contexts(input_file, e.__traceback__)
+
+            raise
+        except Exception as e:
+            raise TransomError(e, self._error_contexts(input_file, e.__traceback__))
+
+    def _render_profiled(self, generator, profile):
+        # The generated function is suspended on the line of the
+        # expression that produced each result, so the time to get
+        # the next result belongs to that expression.  A generator
+        # result can span several results from the same line.
+        line, elapsed = None, 0
+
+        while True:
+            start_time = time.perf_counter()
+
+            try:
+                result = next(generator)
+                result_line = generator.gi_frame.f_lineno
+            except StopIteration:
+                result_line = None
+
+            step_time = time.perf_counter() - start_time
+
+            if result_line != line:
+                if line is not None and (token := self.lines[line]) is not None:
+                    profile.add_expression(self.context, token, elapsed)
+
+                elapsed = 0
+
+            elapsed += step_time
+            line = result_line
+
+            if line is None:
+                return
+
+            yield result
+
+    def write(self, input_file):
+        """
+        Stream the rendered output to its output file.
+        """
+        write_output(input_file.output_path, self.render(input_file))
+
+class PageTemplate(Template):
+    """
+    The content template of one page wrapped in a shared layout.  The
+    layout is the page and body templates, split into parts around
+    `@content@`.
+    """
+    __slots__ = "layout", "content"
+
+    def __init__(self, layout, content):
+        self.layout = layout
+        self.content = content
+        self.context = content.context
+
+    def render(self, input_file):
+        for i, part in enumerate(self.layout):
+            if i > 0:
+                yield from self.content.render(input_file)
+
+            yield from part.render(input_file)
+
+class TemplateCache:
+    """
+    Parsed templates shared by all the pages of a site.  Entries are
+    keyed by path and replaced when the file's modification time
+    changes.
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.site.root_dir))})"
+
+    def _get(self, key, mtimes, load_fn):
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is not None and entry[0] == mtimes:
+            return entry[1]
+
+        # Parsing happens outside the lock.  Two threads may race to
+        # load the same entry, but the results are the same.
+        value = load_fn()
+
+        with self.lock:
+            self.entries[key] = mtimes, value
+
+        return value
+
+    def load_template(self, path) -> Template:
+        """
+        Load the template at `path`.
+        """
+        path = Path(path) if isinstance(path, str) else path
+        record_dependency(path)
+
+        def load():
+            return Template(path.read_text(), path, self.site.render_cache)
+
+        return self._get(("template", os.path.abspath(path)), os.stat(path).st_mtime_ns, load)
+
+    def load_layout(self, page_template, body_template):
+        """
+        Load the page and body templates, combine them, and split the
+        result into parsed parts around `@content@`.  A missing or
+        `None` template contributes only its placeholder.
+        """
+        paths = tuple(Path(x) if x is not None else None for x in (page_template, body_template))
+        mtimes = []
+
+        for path in paths:
+            if path is None:
+                mtimes.append(None)
+                continue
+
+            record_dependency(path)
+
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+
+        def load():
+            page_path, body_path = paths
+            page = page_path.read_text() if mtimes[0] is not None else "@body@"
+            body = body_path.read_text() if mtimes[1] is not None else "@content@"
+            text = page.replace("@body@", body)
+
+            return tuple(Template(x, page_path, self.site.render_cache) for x in text.split("@content@"))
+
+        return self._get(("layout", *(os.path.abspath(x) if x else None for x in paths)), tuple(mtimes), load)
+
+class DependencyTracking:
+    """
+    Record the files read by the current thread as dependencies of
+    `input_file`.
+    """
+    _LOCAL = threading.local()
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = getattr(DependencyTracking._LOCAL, "dependencies", None)
+        DependencyTracking._LOCAL.dependencies = self.input_file.dependencies
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        DependencyTracking._LOCAL.dependencies = self.previous
+
+def record_dependency(path):
+    if (dependencies := getattr(DependencyTracking._LOCAL, "dependencies", None)) is not None:
+        dependencies.add(os.path.abspath(path))
+
+class DependencyGraph:
+    """
+    The files consumed by each output file at its last render, with
+    their modification times.  An output file is rendered again only
+    if one of its dependencies has changed.
+    """
+    _VERSION = 2
+
+    def __init__(self, site):
+        self.site = site
+        self.site_title = None
+        self.index_paths = set()
+        self.entries = {}
+        self.mtimes = {}
+        self.removed_paths = set()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.path))})"
+
+    @property
+    def path(self):
+        return self.site.state_dir / "dependencies.json"
+
+    def load(self):
+        self.site_title = None
+        self.index_paths = set()
+        self.entries = {}
+        self.mtimes = {}
+        self.removed_paths = set()
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            self.site.notice("Ignoring an unreadable dependency graph: {}", self.path)
+            return
+
+        if data.get("version") == DependencyGraph._VERSION:
+            self.site_title = data["site_title"]
+            self.index_paths = set(data["index_paths"])
+            self.entries = data["entries"]
+
+    def save(self, input_files):
+        output_paths = {str(x.output_path) for x in input_files}
+
+        # The outputs of input files that have gone away
+        self.removed_paths = self.entries.keys() - output_paths
+
+        data = {
+            "version": DependencyGraph._VERSION,
+            "site_title": self.site.config.title,
+            "index_paths": sorted(str(x.input_path) for x in self.site.index_files),
+            "entries": {k: v for k, v in self.entries.items() if k in output_paths},
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    def mtime(self, path):
+        try:
+            return self.mtimes[path]
+        except KeyError:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+
+            self.mtimes[path] = mtime
+
+            return mtime
+
+    def is_modified(self, input_file):
+        try:
+            entry = self.entries[str(input_file.output_path)]
+        except KeyError:
+            return True
+
+        if not input_file.output_path.exists():
+            return True
+
+        return any(self.mtime(k) != v for k, v in entry["dependencies"].items())
+
+    def get_title(self, input_file):
+        return self.entries[str(input_file.output_path)]["title"]
+
+    def depends_on(self, input_file, paths):
+        """
+        Return true if the last render of `input_file` used any of
+        `paths`.
+        """
+        try:
+            entry = self.entries[str(input_file.output_path)]
+        except KeyError:
+            return False
+
+        return not paths.isdisjoint(entry["dependencies"])
+
+    def update(self, input_file):
+        entry = {
+            "title": input_file.title,
+            "dependencies": {x: self.mtime(x) for x in sorted(input_file.dependencies)},
+        }
+
+        with self.lock:
+            self.entries[str(input_file.output_path)] = entry
+
+class AssetManifest:
+    """
+    The fingerprinted copy of each asset, by path in the output
+    directory.  A fingerprinted copy has a hash of its content in its
+    name, so its URL changes whenever its content does.
+    """
+    _VERSION = 1
+
+    def __init__(self, site):
+        self.site = site
+        self.assets = {}
+        self.replaced_paths = set()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.path))})"
+
+    @property
+    def path(self):
+        return self.site.state_dir / "assets.json"
+
+    def load(self):
+        self.assets = {}
+        self.replaced_paths = set()
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            self.site.notice("Ignoring an unreadable asset manifest: {}", self.path)
+            return
+
+        if data.get("version") == AssetManifest._VERSION:
+            self.assets = data["assets"]
+
+    def save(self, input_files):
+        asset_paths = {x.output_path.relative_to(self.site.output_dir).as_posix()
+                       for x in input_files if x.fingerprinted}
+
+        data = {
+            "version": AssetManifest._VERSION,
+            "assets": {k: v for k, v in sorted(self.assets.items()) if k in asset_paths},
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def add(self, input_file):
+        """
+        Place the fingerprinted copy of the output of `input_file` and
+        remove the one it replaces.
+        """
+        output_path = input_file.output_path
+
+        with open(output_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()[:16]
+
+        stem, dot, suffix = output_path.name.rpartition(".")
+        name = f"{stem}.{digest}.{suffix}" if dot else f"{output_path.name}.{digest}"
+        key = output_path.relative_to(self.site.output_dir).as_posix()
+        value = output_path.with_name(name).relative_to(self.site.output_dir).as_posix()
+
+        place_file(output_path, output_path.with_name(name), "hardlink")
+
+        with self.lock:
+            old_value, self.assets[key] = self.assets.get(key), value
+
+            # The plain URL of a new asset is replaced as well
+            if old_value is None:
+                self.replaced_paths.add(str(output_path))
+            elif old_value != value:
+                old_path = self.site.output_dir / old_value
+                remove_output(old_path)
+
+                self.replaced_paths.add(str(old_path))
+
+    def remove(self, output_path):
+        """
+        Remove the fingerprinted copy of the output file at
+        `output_path`, if it has one.
+        """
+        key = output_path.relative_to(self.site.output_dir).as_posix()
+
+        with self.lock:
+            value = self.assets.pop(key, None)
+
+        if value is not None:
+            remove_output(self.site.output_dir / value)
+
+    def get_path(self, input_file):
+        """
+        Return the path of the fingerprinted copy of the output of
+        `input_file`, or None.
+        """
+        if not input_file.fingerprinted:
+            return None
+
+        key = input_file.output_path.relative_to(self.site.output_dir).as_posix()
+
+        try:
+            return self.site.output_dir / self.assets[key]
+        except KeyError:
+            return None
+
+    def url(self, path) -> str:
+        """
+        Return the URL of the fingerprinted copy of the output file at
+        `path`, relative to the output directory.  Files without a
+        fingerprinted copy get their plain URL.
+        """
+        path = str(path).removeprefix("/")
+
+        try:
+            path = self.assets[path]
+        except KeyError:
+            # The asset may not have its fingerprinted copy yet.  See
+            # AssetManifest.add.
+            if self.site._fingerprinted_files_re.match(path.rpartition("/")[2]):
+                record_dependency(self.site.output_dir / path)
+        else:
+            record_dependency(self.site.output_dir / path)
+
+        return f"{self.site.config.prefix}/{path}"
+
+class SearchIndex:
+    """
+    A full-text index of the site pages for client-side search.  The
+    postings of each term are written to a shard named by the first
+    two characters of the term, so a browser fetches only the shards
+    for the words it looks up.  The terms of each page are kept with
+    the index, so a render updates only the postings of the pages it
+    renders.
+    """
+    _VERSION = 1
+    _TITLE_WEIGHT = 10
+    _MARKUP_RE = re.compile(r"(?is)<(head|script|style)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>")
+    _ACCENT_RE = re.compile(r"[\u0300-\u036f]")
+    _WORD_RE = re.compile(r"\w{2,}")
+
+    def __init__(self, site):
+        self.site = site
+        self.pages = {}
+        self.postings = {}
+        self.next_id = 1
+        self.modified = False
+        self.modified_shards = set()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.path))})"
+
+    @property
+    def path(self):
+        return self.site.state_dir / "search.json"
+
+    @property
+    def output_dir(self):
+        return self.site.output_dir / "_transom" / "search"
+
+    @staticmethod
+    def words(text):
+        """
+        Return the words of `text` as index terms, in lowercase and
+        without accents.
+        """
+        text = SearchIndex._ACCENT_RE.sub("", unicodedata.normalize("NFKD", text))
+        return SearchIndex._WORD_RE.findall(text.lower())
+
+    def includes(self, input_file):
+        return self.site.config.search_index and isinstance(input_file, TemplatePage) \
+            and input_file.output_path.suffix == ".html"
+
+    def load(self, input_files):
+        """
+        Load the saved index.  Pages missing from it are dropped from
+        the dependency graph, so they are rendered and indexed again.
+        """
+        self.pages = {}
+        self.postings = {}
+        self.next_id = 1
+        self.modified = False
+        self.modified_shards = set()
+
+        if not self.site.config.search_index:
+            return
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except ValueError:
+            self.site.notice("Ignoring an unreadable search index: {}", self.path)
+            data = {}
+
+        if data.get("version") == SearchIndex._VERSION:
+            self.pages = data["pages"]
+            self.next_id = data["next_id"]
+
+        for page in self.pages.values():
+            for term, weight in page["terms"].items():
+                self.postings.setdefault(term[:2], {}).setdefault(term, {})[page["id"]] = weight
+
+        # Write everything again if the index output has gone missing
+        if not (self.output_dir / "pages.json").exists():
+            self.modified = True
+            self.modified_shards = set(self.postings)
+
+        for input_file in input_files:
+            if self.includes(input_file) and str(input_file.output_path) not in self.pages:
+                self.site.dependency_graph.entries.pop(str(input_file.output_path), None)
+
+    def save(self, input_files):
+        if not self.site.config.search_index:
+            return
+
+        output_paths = {str(x.output_path) for x in input_files if self.includes(x)}
+
+        for key in self.pages.keys() - output_paths:
+            self._update_postings(self.pages.pop(key), {})
+            self.modified = True
+
+        if not self.modified:
+            return
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        for shard in sorted(self.modified_shards):
+            path = self.output_dir / f"{shard}.json"
+
+            if terms := self.postings.get(shard):
+                data = {k: list(itertools.chain.from_iterable(sorted(v.items()))) for k, v in sorted(terms.items())}
+                self._write(path, data)
+            else:
+                remove_output(path)
+
+        pages = {x["id"]: [x["url"], x["title"]] for x in sorted(self.pages.values(), key=lambda x: x["id"])}
+        self._write(self.output_dir / "pages.json", pages)
+
+        data = {
+            "version": SearchIndex._VERSION,
+            "next_id": self.next_id,
+            "pages": self.pages,
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+        self.modified = False
+        self.modified_shards = set()
+
+    def _write(self, path, data):
+        self.site.write_generated_file(path, (json.dumps(data, ensure_ascii=False, separators=(",", ":")),))
+
+    def content_terms(self, input_file):
+        """
+        Return the weight of each term in the content of
+        `input_file`.
+        """
+        text = SearchIndex._MARKUP_RE.sub(" ", input_file.search_text())
+        return dict(Counter(self.words(html.unescape(text))))
+
+    def update(self, input_file, terms=None):
+        """
+        Index the rendered `input_file`.  `terms` are its content
+        terms, if a worker process has extracted them already.
+        """
+        if not self.includes(input_file):
+            return
+
+        if terms is None:
+            terms = self.content_terms(input_file)
+
+        title = html.unescape(SearchIndex._MARKUP_RE.sub("", input_file.title or "")).strip()
+
+        for word in self.words(title):
+            terms[word] = terms.get(word, 0) + SearchIndex._TITLE_WEIGHT
+
+        key = str(input_file.output_path)
+
+        with self.lock:
+            old_page = self.pages.get(key)
+
+            if old_page is None:
+                page_id, self.next_id = self.next_id, self.next_id + 1
+                old_page = {"id": page_id, "url": None, "title": None, "terms": {}}
+
+            page = {"id": old_page["id"], "url": input_file.url, "title": title, "terms": terms}
+
+            if page != old_page:
+                self._update_postings(old_page, terms)
+                self.pages[key] = page
+                self.modified = True
+
+    def _update_postings(self, page, terms):
+        # Only the postings of terms whose weight has changed are
+        # touched
+        old_terms = page["terms"]
+        page_id = page["id"]
+
+        for term in old_terms.keys() - terms.keys():
+            shard = self.postings[term[:2]]
+            del shard[term][page_id]
+
+            if not shard[term]:
+                del shard[term]
+
+            self.modified_shards.add(term[:2])
+
+        for term, weight in terms.items():
+            if old_terms.get(term) != weight:
+                self.postings.setdefault(term[:2], {}).setdefault(term, {})[page_id] = weight
+                self.modified_shards.add(term[:2])
+
+class RenderCache:
+    """
+    A persistent store of converted Markdown, parsed templates, and
+    minified output, keyed by a hash of the source text and the code
+    that produced them.  Unchanged sources are not converted or
+    parsed again, even when their modification times change.
+    """
+    _SALT = None
+
+    def __init__(self, site, enabled=True):
+        self.site = site
+        self.enabled = enabled
+        self.markdown_blocks = {k: MarkdownBlocks(v) for k, v in MARKDOWN_MODES.items()}
+
+        # The entries hold marshaled code objects, which only the same
+        # bytecode version can use
+        if RenderCache._SALT is None:
+            RenderCache._SALT = hashlib.sha256(Path(__file__).read_bytes()).hexdigest() + mistune.__version__ \
+                + importlib.util.MAGIC_NUMBER.hex()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.path))})"
+
+    @property
+    def path(self):
+        if self.site.config.cache_dir is not None:
+            return Path(self.site.config.cache_dir)
+
+        return self.site.state_dir / "cache"
+
+    def key(self, kind, text):
+        return hashlib.sha256(f"{RenderCache._SALT}:{kind}:{text}".encode()).hexdigest()
+
+    def get(self, key):
+        path = self.path / key[:2] / key
+
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+
+        return data
+
+    def load(self, key):
+        """
+        Return the marshaled value stored under `key`, or None if there
+        is none or it can't be read.
+        """
+        if (data := self.get(key)) is None:
+            return None
+
+        try:
+            return marshal.loads(data)
+        except (EOFError, TypeError, ValueError):
+            return None
+
+    def put(self, key, data):
+        path = self.path / key[:2] / key
+        temp_path = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+
+    def convert_markdown(self, text):
+        mode = self.site.config.markdown_mode
+
+        if not self.enabled:
+            return MARKDOWN_MODES[mode].convert(text)
+
+        key = self.key(f"markdown:{mode}", text)
+
+        if (result := self.load(key)) is not None:
+            return result
+
+        result = self.markdown_blocks[mode].convert(text)
+
+        self.put(key, marshal.dumps(result))
+
+        return result
+
+    def parse_template(self, template, text):
+        if not self.enabled:
+            return template._parse(text)
+
+        key = self.key("template", text)
+
+        match self.load(key):
+            case (types.CodeType() as code, tuple() as texts, tuple() as lines):
+                return code, texts, lines
+
+        parsed = template._parse(text)
+
+        self.put(key, marshal.dumps(parsed))
+
+        return parsed
+
+    def minify(self, suffix, text):
+        minify = MINIFIERS[suffix]
+
+        if not self.enabled:
+            return minify(text)
+
+        key = self.key(f"minify{suffix}", text)
+
+        if (data := self.get(key)) is not None:
+            return data.decode()
+
+        minified_text = minify(text)
+
+        self.put(key, minified_text.encode())
+
+        return minified_text
+
+    def evict(self):
+        if not self.enabled:
+            return
+
+        entries = []
+
+        try:
+            with os.scandir(self.path) as dirs:
+                for dir_ in dirs:
+                    # Skip anything else kept in a custom cache dir
+                    if not dir_.is_dir():
+                        continue
+
+                    with os.scandir(dir_.path) as files:
+                        for file_ in files:
+                            stat = file_.stat()
+                            entries.append((stat.st_mtime_ns, stat.st_size, file_.path))
+        except FileNotFoundError:
+            return
+
+        size = sum(x[1] for x in entries)
+
+        if size <= self.site.config.cache_size:
+            return
+
+        self.site.debug("Evicting cache entries from '{}'", self.path)
+
+        for mtime, entry_size, path in sorted(entries):
+            os.remove(path)
+            size -= entry_size
+
+            if size <= self.site.config.cache_size:
+                break
+
+class MarkdownBlocks:
+    """
+    Converts Markdown one top-level block segment at a time.  The HTML
+    of each segment is kept in memory by hash of its source, so a
+    change to one part of a long page converts only that part again.
+    Reference link definitions apply to the whole document, so those
+    of every segment are gathered before any segment is rendered.
+    A segment with a heading id already used by an earlier segment is
+    rendered again with the used ids, so ids stay unique.
+    """
+    _MAX_ENTRIES = 100_000
+
+    def __init__(self, markdown_local=None):
+        self.markdown_local = MarkdownLocal.INSTANCE if markdown_local is None else markdown_local
+        self.definitions = {}
+        self.results = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self.results)})"
+
+    @staticmethod
+    def _parse(markdown, segment):
+        state = markdown.block.state_cls()
+        state.process(segment if segment.endswith("\n") else segment + "\n")
+        markdown.block.parse(state)
+
+        return state
+
+    def convert(self, text):
+        markdown = self.markdown_local.value
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        segments = split_markdown(text)
+
+        # Hooks may need the whole document
+        if len(segments) < 2 or markdown.before_parse_hooks or markdown.before_render_hooks \
+           or markdown.after_render_hooks:
+            return self.markdown_local.convert(text)
+
+        if len(self.results) > MarkdownBlocks._MAX_ENTRIES:
+            self.definitions.clear()
+            self.results.clear()
+
+        digests = [hashlib.blake2b(x.encode(), digest_size=16).digest() for x in segments]
+        states = {}
+        ref_links = {}
+
+        for segment, digest in zip(segments, digests):
+            try:
+                definitions = self.definitions[digest]
+            except KeyError:
+                state = states[digest] = MarkdownBlocks._parse(markdown, segment)
+                definitions = self.definitions[digest] = dict(state.env["ref_links"])
+
+            # The first definition of a label wins
+            for label, definition in definitions.items():
+                ref_links.setdefault(label, definition)
+
+        # Only segments with brackets can use a reference link
+        ref_links_digest = hashlib.blake2b(repr(sorted(ref_links.items())).encode(), digest_size=16).digest()
+        results = []
+        headings = []
+        heading_ids = set()
+
+        for segment, digest in zip(segments, digests):
+            key = (digest, ref_links_digest if "[" in segment else None)
+
+            try:
+                result = self.results[key]
+            except KeyError:
+                state = states.pop(digest, None) or MarkdownBlocks._parse(markdown, segment)
+                state.env["ref_links"] = ref_links
+                result = self.results[key] = markdown.render_state(state), tuple(markdown.renderer.headings)
+
+            if result[1]:
+                if any(x[1] in heading_ids for x in result[1]):
+                    state = MarkdownBlocks._parse(markdown, segment)
+                    state.env["ref_links"] = ref_links
+                    state.env["heading_ids"] = heading_ids
+                    result = markdown.render_state(state), tuple(markdown.renderer.headings)
+
+                heading_ids.update(x[1] for x in result[1])
+                headings.extend(result[1])
+
+            results.append(result[0])
+
+        return "".join(results), tuple(headings)
+
+class RenderProfile:
+    """
+    Timings for `transom render --profile`.  It records the site
+    phases, the steps of each file, the step totals of each worker,
+    and the time spent in each template expression.
+    """
+    STEPS = "stat", "read", "header", "markdown", "parse", "render", "minify", "write", "compress"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.files = {}
+        self.workers = {}
+        self.expressions = {}
+
+    def timer(self, input_file, step):
+        return ProfileTimer(self, input_file, step)
+
+    def add(self, input_file, step, elapsed):
+        with self.lock:
+            if input_file is None:
+                self.phases[step] = self.phases.get(step, 0) + elapsed
+                return
+
+            for steps, key in ((self.files, str(input_file.input_path)),
+                               (self.workers, threading.current_thread().name)):
+                steps = steps.setdefault(key, {})
+                steps[step] = steps.get(step, 0) + elapsed
+
+    def add_expression(self, context, token, elapsed):
+        key = str(context), token
+
+        with self.lock:
+            entry = self.expressions.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def data(self):
+        with self.lock:
+            return {
+                "phases": dict(self.phases),
+                "files": {k: dict(v) for k, v in self.files.items()},
+                "workers": {k: dict(v) for k, v in self.workers.items()},
+                "expressions": [{"template": k[0], "expression": k[1], "count": v[0], "time": v[1]}
+                                for k, v in self.expressions.items()],
+            }
+
+    def merge(self, data):
+        """
+        Add the timings from `data()` of another profile, as returned
+        by a worker process.
+        """
+        with self.lock:
+            for name in ("files", "workers"):
+                for key, steps in data[name].items():
+                    totals = getattr(self, name).setdefault(key, {})
+
+                    for step, elapsed in steps.items():
+                        totals[step] = totals.get(step, 0) + elapsed
+
+            for expression in data["expressions"]:
+                entry = self.expressions.setdefault((expression["template"], expression["expression"]), [0, 0])
+                entry[0] += expression["count"]
+                entry[1] += expression["time"]
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.data(), f, indent=2)
+
+    def report(self, top=10):
+        data = self.data()
+        lines = ["Phases"]
+
+        for phase, elapsed in data["phases"].items():
+            lines.append(f"  {phase:<24} {elapsed:9.3f}s")
+
+        lines.append("Steps by worker")
+
+        for worker, steps in sorted(data["workers"].items()):
+            totals = " ".join(f"{x} {steps[x]:.3f}s" for x in RenderProfile.STEPS if x in steps)
+            lines.append(f"  {worker:<24} {totals}")
+
+        lines.append(f"Slowest files (top {top})")
+
+        for path, steps in sorted(data["files"].items(), key=lambda x: sum(x[1].values()), reverse=True)[:top]:
+            totals = ", ".join(f"{x} {steps[x]:.3f}s" for x in RenderProfile.STEPS if x in steps)
+            lines.append(f"  {sum(steps.values()):9.3f}s {path} ({totals})")
+
+        lines.append(f"Slowest template expressions (top {top})")
+
+        for entry in sorted(data["expressions"], key=lambda x: x["time"], reverse=True)[:top]:
+            lines.append(f"  {entry['time']:9.3f}s {entry['count']:>6,}x {entry['template']}: {entry['expression']}")
+
+        return "\n".join(lines)
+
+class ProfileTimer:
+    __slots__ = "profile", "input_file", "step", "start_time"
+
+    def __init__(self, profile, input_file, step):
+        self.profile = profile
+        self.input_file = input_file
+        self.step = step
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.add(self.input_file, self.step, time.perf_counter() - self.start_time)
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+NULL_TIMER = NullTimer()
+
+class WorkerThread(threading.Thread):
+    def __init__(self, site, name, errors):
+        super().__init__(name=name)
+
+        self.site = site
+        self.errors = errors
+        self.commands = Queue()
+
+        self.file_count = 0
+        self.busy_time = 0
+
+    def run(self):
+        while True:
+            fn, args = self.commands.get()
+
+            if fn is None:
+                break
+
+            self.file_count = 0
+            start_time = time.perf_counter()
+
+            try:
+                fn(*args)
+            except Exception as e: # pragma: nocover
+                traceback.print_exc()
+                self.errors.put((None, e))
+            finally:
+                self.busy_time = time.perf_counter() - start_time
+                self.commands.task_done()
+
+    def take_files(self, work):
+        while True:
+            try:
+                input_file = work.get_nowait()
+            except Empty:
+                return
+
+            self.file_count += 1
+
+            yield input_file
+
+    def handle_error(self, input_file, e):
+        self.site.error(str(e))
+        self.errors.put((input_file, e))
+
+    def process_input_files(self, work, force, modified_files):
+        for input_file in self.take_files(work):
+            try:
+                modified = input_file.process_input(force)
+            except TransomError as e:
+                self.handle_error(input_file, e)
+                continue
+
+            if modified:
+                modified_files.append(input_file)
+
+    def render_output_files(self, work):
+        for input_file in self.take_files(work):
+            try:
+                input_file.render_output()
+                input_file.fingerprint_output()
+                input_file.compress_output()
+            except TransomError as e:
+                self.handle_error(input_file, e)
+                continue
+            finally:
+                self.site.pending_outputs.discard(str(input_file.output_path))
+
+            self.site.dependency_graph.update(input_file)
+            self.site.search_index.update(input_file)
+
+    def scan_html_files(self, work, scans):
+        for html_path in self.take_files(work):
+            scans.append(scan_html_file(html_path))
+
+class WorkerProcess:
+    """
+    The state of a worker process.  Each worker loads the site config
+    and input files once.  Only input paths go in and only titles,
+    dependencies, search terms, and errors come back.
+    """
+    INSTANCE = None
+
+    def __init__(self, root_dir, output_dir, verbose, quiet, cache, profile):
+        self.site = TransomSite(root_dir, verbose=verbose, quiet=quiet, threads=0, cache=cache, workers="process")
+        self.site.output_dir = output_dir
+        self.profile = profile
+
+        threading.current_thread().name = f"worker-process-{os.getpid()}"
+
+        self.site.load_config_files()
+
+        self.input_files = {str(x.input_path): x for x in self.site.load_input_files()}
+        self.ready_files = set()
+        self.force = False
+
+        self.site.dependency_graph.load()
+        self.site.asset_manifest.load()
+
+    @staticmethod
+    def initialize(*args):
+        WorkerProcess.INSTANCE = WorkerProcess(*args)
+
+    @staticmethod
+    def render_input_files(input_paths, force):
+        worker = WorkerProcess.INSTANCE
+
+        # Each batch gets a fresh profile, so the timings go back to
+        # the main process only once
+        if worker.profile:
+            worker.site.profile = RenderProfile()
+
+        worker.site.minified_sizes = {}
+        worker.force = force
+
+        results = [worker.render_input_file(x, force) for x in input_paths]
+        profile_data = None if worker.site.profile is None else worker.site.profile.data()
+
+        return results, profile_data, worker.site.minified_sizes
+
+    def prepare(self, input_file, force):
+        # Titles are all that other pages need, so unchanged files are
+        # not processed again
+        if input_file not in self.ready_files:
+            input_file.process_input(force)
+            self.ready_files.add(input_file)
+
+    def render_input_file(self, input_path, force):
+        input_file = self.input_files[input_path]
+
+        try:
+            if self.site.config.title is None:
+                first_file = next(iter(self.input_files.values()))
+                self.prepare(first_file, force)
+                self.site.config.title = first_file.title
+
+            for parent in input_file.parents:
+                self.prepare(parent, force)
+
+            input_file.process_input()
+            input_file.render_output()
+            input_file.fingerprint_output()
+            input_file.compress_output()
+
+            self.ready_files.add(input_file)
+
+            if self.site.search_index.includes(input_file):
+                terms = self.site.search_index.content_terms(input_file)
+            else:
+                terms = None
+        except TransomError as e:
+            self.site.error(str(e))
+            return input_path, None, None, None, str(e)
+        except Exception as e: # pragma: nocover
+            traceback.print_exc()
+            return input_path, None, None, None, str(e)
+
+        return input_path, input_file.title, sorted(input_file.dependencies), terms, None
+
+class FileWatcher:
+    """
+    Watch the config and input directories for changes.  It uses
+    inotify where the C library provides it and falls back to polling
+    the file modification times.
+    """
+    _IN_NONBLOCK = 0o4000
+    _IN_CLOEXEC = 0o2000000
+    _IN_EVENTS = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400 | 0x800 # Modify, attrib, write, move,
+                                                                             # create, delete
+    _IN_CREATE_OR_MOVED_TO = 0x100 | 0x80
+    _IN_Q_OVERFLOW = 0x4000
+    _IN_ISDIR = 0x40000000
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, site, polling=False):
+        self.site = site
+
+        self.fd = None
+        self.watches = {}
+        self.snapshot = None
+
+        try:
+            if polling:
+                raise OSError("Polling requested")
+
+            self._start_inotify()
+        except (AttributeError, OSError):
+            self.close()
+            self.snapshot = self._scan()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(str(self.site.root_dir))})"
+
+    @property
+    def mode(self):
+        return "inotify" if self.fd is not None else "polling"
+
+    def _start_inotify(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+
+        self._inotify_add_watch = libc.inotify_add_watch
+        self._inotify_add_watch.argtypes = ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+
+        self.fd = libc.inotify_init1(FileWatcher._IN_NONBLOCK | FileWatcher._IN_CLOEXEC)
+
+        if self.fd < 0:
+            self.fd = None
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._add_watch(self.site.root_dir)
+        self._add_watches(self.site.config_dir)
+        self._add_watches(self.site.input_dir)
+
+    def _add_watch(self, path):
+        wd = self._inotify_add_watch(self.fd, os.fsencode(path), FileWatcher._IN_EVENTS)
+
+        if wd < 0:
+            errno = ctypes.get_errno()
+
+            # The directory went away before we got to it
+            if errno == 2:
+                return
+
+            raise OSError(errno, f"Failed to watch '{path}'")
+
+        self.watches[wd] = Path(path)
+
+    def _add_watches(self, start_path):
+        for dir_, subdirs, files in os.walk(start_path, followlinks=True):
+            self._add_watch(dir_)
+
+    def _is_relevant(self, path):
+        if path.parent == self.site.root_dir:
+            return path.name in (self.site.config_dir.name, self.site.input_dir.name)
+
+        ignored_files_re = getattr(self.site, "_ignored_files_re", None)
+
+        return ignored_files_re is None or not ignored_files_re.match(path.name)
+
+    def _scan(self):
+        snapshot = {}
+
+        for start_path in (self.site.config_dir, self.site.input_dir):
+            for dir_, subdirs, files in os.walk(start_path, followlinks=True):
+                for name in files:
+                    path = os.path.join(dir_, name)
+
+                    try:
+                        snapshot[path] = os.stat(path).st_mtime_ns
+                    except FileNotFoundError:
+                        pass
+
+        return snapshot
+
+    def wait(self, timeout):
+        """
+        Block until there might be changes or `timeout` passes.
+        """
+        if self.fd is not None:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+            return bool(readable)
+
+        time.sleep(timeout)
+
+        return True
+
+    def pending(self):
+        """
+        Return true if inotify has events not yet checked.  It does
+        not block, and it is always false when polling.
+        """
+        if self.fd is None:
+            return False
+
+        readable, _, _ = select.select([self.fd], [], [], 0)
+
+        return bool(readable)
+
+    def check(self):
+        """
+        Return true if anything changed since the last check.
+        """
+        if self.fd is None:
+            snapshot = self._scan()
+            changed, self.snapshot = snapshot != self.snapshot, snapshot
+
+            return changed
+
+        changed = False
+
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+            offset = 0
+
+            while offset < len(data):
+                wd, mask, cookie, length = FileWatcher._EVENT_HEADER.unpack_from(data, offset)
+                offset += FileWatcher._EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & FileWatcher._IN_Q_OVERFLOW:
+                    changed = True
+                    continue
+
+                try:
+                    path = self.watches[wd] / name
+                except KeyError:
+                    continue
+
+                if not self._is_relevant(path):
+                    continue
+
+                if mask & FileWatcher._IN_ISDIR and mask & FileWatcher._IN_CREATE_OR_MOVED_TO:
+                    self._add_watches(path)
+
+                changed = True
+
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+_HTML_TAG_RE = re.compile(r"(?is)<(?:!--.*?--|(script|style)\b([^>]*)>.*?</\1\s*|([a-z][a-z0-9-]*\s[^>]*))>")
+_HTML_LINK_ATTR_RE = re.compile(r"""(?i)\s(href|src|id|name)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+
+def scan_html_file(path):
+    """
+    Return `path`, the element IDs, and the links with their line
+    numbers in the HTML file at `path`.  It scans the tags with
+    regular expressions, skipping comments and the content of script
+    and style elements.
+    """
+    with open(path, errors="replace") as f:
+        text = f.read()
+
+    ids, links = [], []
+    line, pos = 1, 0
+
+    for match in _HTML_TAG_RE.finditer(text):
+        _, script_attrs, tag = match.groups()
+
+        for name, value1, value2, value3 in _HTML_LINK_ATTR_RE.findall(tag or script_attrs or ""):
+            value = value1 or value2 or value3
+
+            if "&" in value:
+                value = html.unescape(value)
+
+            if name.lower() in ("id", "name"):
+                ids.append(value)
+            else:
+                line += text.count("\n", pos, match.start())
+                pos = match.start()
+                links.append((line, value))
+
+    return path, ids, links
+
+def scan_html_files(paths):
+    return [scan_html_file(x) for x in paths]
+
+COMPRESSION_CODECS = {
+    "gzip": (".gz", partial(gzip.compress, compresslevel=9, mtime=0)),
+}
+
+if zstd is not None: # pragma: nocover
+    COMPRESSION_CODECS["zstd"] = (".zst", partial(zstd.compress, level=19))
+
+def compress_file(path, config):
+    """
+    Write a compressed copy of the file at `path` for each codec in
+    `config.compression`.  Copies at least as new as the file are kept
+    as is, and copies of files below the size threshold are removed.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    data = None
+
+    for codec in config.compression:
+        suffix, compress = COMPRESSION_CODECS[codec]
+        compressed_path = path.with_name(path.name + suffix)
+
+        try:
+            if os.stat(compressed_path).st_mtime_ns >= mtime:
+                continue
+        except FileNotFoundError:
+            pass
+
+        if data is None:
+            data = path.read_bytes()
+
+        if len(data) < config.compression_threshold:
+            compressed_path.unlink(missing_ok=True)
+            continue
+
+        temp_path = compressed_path.with_name(f".{compressed_path.name}.{os.getpid()}.tmp")
+
+        try:
+            temp_path.write_bytes(compress(data))
+            os.replace(temp_path, compressed_path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+def find_compressed_file(file_path, stat, accept_encoding):
+    """
+    Return the path, encoding, and stat of a precompressed copy of
+    `file_path` that the client accepts, or None.  Copies older than
+    the file are ignored.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = set()
+
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        params = params.replace(" ", "")
+
+        if params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+
+    for codec in ("zstd", "gzip"):
+        if codec in accepted and codec in COMPRESSION_CODECS:
+            compressed_path = f"{file_path}{COMPRESSION_CODECS[codec][0]}"
+
+            try:
+                compressed_stat = os.stat(compressed_path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            if compressed_stat.st_mtime_ns >= stat.st_mtime_ns:
+                return compressed_path, codec, compressed_stat
+
+    return None
+
+class ETagCache:
+    """
+    Strong entity tags for output files, from a hash of their content.
+    A tag is computed again only if the file is replaced or modified.
+    """
+    def __init__(self):
+        self.tags = {}
+
+    def get(self, path, stat=None):
+        stat = os.stat(path) if stat is None else stat
+        key = stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+        try:
+            tag_key, tag = self.tags[path]
+        except KeyError:
+            tag_key, tag = None, None
+
+        if tag_key != key:
+            with open(path, "rb") as f:
+                tag = f"\"{hashlib.file_digest(f, 'sha256').hexdigest()[:32]}\""
+
+            self.tags[path] = key, tag
+
+        return tag
+
+    def cached(self, path, stat):
+        """
+        Return the tag for `path` if it doesn't need computing, or
+        None.
+        """
+        try:
+            tag_key, tag = self.tags[path]
+        except KeyError:
+            return None
+
+        return tag if tag_key == (stat.st_ino, stat.st_mtime_ns, stat.st_size) else None
+
+def cache_headers(config, path, etag, stat):
+    """
+    Return the validator and `Cache-Control` headers for the output
+    file at `path`, relative to the output directory.
+    """
+    headers = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True)}
+
+    if config.compression:
+        headers["Vary"] = "Accept-Encoding"
+
+    for pattern, value in config.cache_control.items():
+        if fnmatch.fnmatchcase(path, pattern):
+            headers["Cache-Control"] = value
+            break
+
+    return headers
+
+def is_not_modified(if_none_match, if_modified_since, etag, stat):
+    """
+    Return true if the request conditions mean the client's copy is
+    current.  `If-None-Match` takes precedence over
+    `If-Modified-Since`.
+    """
+    if if_none_match is not None:
+        tags = [x.strip().removeprefix("W/") for x in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+        return since.tzinfo is not None and int(stat.st_mtime) <= since.timestamp()
+
+    return False
+
+class Server(httpserver.ThreadingHTTPServer):
+    def __init__(self, site, port, live_reload=False):
+        # Set before binding, since a failed bind calls server_close
+        self.stopping = threading.Event()
+        self.watcher = None
+        self.watcher_thread = None
+
+        super().__init__(("localhost", port), ServerRequestHandler)
+
+        self.site = site
+        self.live_reload = live_reload
+        self.lock = threading.Lock()
+        self.refreshed = threading.Condition()
+        self.refreshing = False
+        self.errors = {}
+        self.reload_queues = set()
+        self.etags = ETagCache()
+
+        self.watcher = FileWatcher(site)
+        self.site.debug("Watching for changes using {}", self.watcher.mode)
+
+        self.render()
+
+        self.watcher_thread = threading.Thread(target=self.watch, name="watcher-thread")
+        self.watcher_thread.start()
+
+    def server_close(self):
+        self.stopping.set()
+
+        if self.watcher_thread is not None:
+            self.watcher_thread.join()
+
+        if self.watcher is not None:
+            self.watcher.close()
+
+        super().server_close()
+
+    def watch(self):
+        while not self.stopping.is_set():
+            try:
+                if self.watcher.wait(0.25):
+                    # Let a burst of editor writes settle
+                    time.sleep(0.05)
+                    self.refresh()
+            except Exception as e:
+                # Keep watching, so a later change can fix things
+                self.site.log(f"{colorize('error:', '31;1')} Watching for changes failed: {e}")
+                traceback.print_exc()
+
+                time.sleep(0.25)
+
+    def refresh(self):
+        """
+        Render again if any config or input files changed.
+        """
+        with self.lock:
+            try:
+                with self.refreshed:
+                    self.refreshing = self.watcher.check()
+
+                if self.refreshing:
+                    self.render()
+            finally:
+                with self.refreshed:
+                    self.refreshing = False
+                    self.refreshed.notify_all()
+
+    def await_refresh(self, timeout=10):
+        """
+        Wait until the watcher thread has rendered the changes it has
+        seen.  Requests call this instead of taking the render lock,
+        and return at once when there are no changes.
+        """
+        if not (self.refreshing or self.watcher.pending()):
+            return
+
+        with self.refreshed:
+            self.refreshed.wait_for(lambda: not (self.refreshing or self.watcher.pending())
+                                    or self.stopping.is_set(), timeout)
+
+    def render(self):
+        try:
+            self.site.render()
+        except TransomError as e:
+            self.site.log(f"{colorize('error:', '31;1')} {e}")
+
+        self.errors = {str(f.output_path): e for f, e in list(self.site.worker_errors.queue) if f is not None}
+
+        if self.site.modified_files:
+            message = json.dumps([x.url for x in self.site.modified_files])
+
+            for queue in tuple(self.reload_queues):
+                queue.put(message)
+
+class ServerRequestHandler(httpserver.SimpleHTTPRequestHandler):
+    _RELOAD_PATH = "/_transom/reload"
+    _RELOAD_SCRIPT = b"""<script>
+new EventSource("/_transom/reload").onmessage = (event) => {
+  const path = location.pathname.endsWith("/") ? `${location.pathname}index.html` : location.pathname;
+  if (JSON.parse(event.data).some(x => x === path || !x.endsWith(".html"))) location.reload();
+};
+</script>
+"""
+
+    def __init__(self, request, client_address, server, directory=None):
+        self.cache_headers = {}
+
+        super().__init__(request, client_address, server, directory=server.site.output_dir)
+
+    def end_headers(self):
+        self.send_header("Cross-Origin-Opener-Policy", "same-origin")
+        self.send_header("Cross-Origin-Embedder-Policy", "require-corp")
+
+        for name, value in self.cache_headers.items():
+            if name != "Last-Modified":
+                self.send_header(name, value)
+
+        super().end_headers()
+
+    def do_GET(self):
+        if self.server.live_reload and self.path == ServerRequestHandler._RELOAD_PATH:
+            self.send_reload_events()
+            return
+
+        super().do_GET()
+
+    def do_POST(self):
+        assert self.path == "/STOP", self.path
+
+        self.server.shutdown()
+
+        self.send_response(httpserver.HTTPStatus.OK)
+        self.end_headers()
+
+    # This intercepts all GET and HEAD requests
+    def send_head(self):
+        self.cache_headers = {}
+        prefix = self.server.site.config.prefix
+
+        if not self.path.startswith(prefix):
+            self.send_response(httpserver.HTTPStatus.TEMPORARY_REDIRECT)
+            self.send_header("Location", prefix + self.path)
+            self.end_headers()
+            return
+
+        self.path = self.path + "index.html" if self.path.endswith("/") else self.path
+        self.path = self.path.removeprefix(prefix).removeprefix("/")
+
+        # A request right after an edit waits for the watcher thread
+        # to render it, so the page is current
+        self.server.await_refresh()
+
+        if error := self.server.errors.get(str(self.server.site.output_dir / self.path)):
+            self.send_error(httpserver.HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+            return
+
+        file_path = self.translate_path(self.path)
+        live_reload_page = self.server.live_reload and self.path.endswith(".html")
+
+        try:
+            stat = os.stat(file_path)
+            compressed = None if live_reload_page else \
+                find_compressed_file(file_path, stat, self.headers.get("Accept-Encoding"))
+
+            if compressed is not None:
+                return self.send_compressed_head(file_path, *compressed)
+
+            etag = self.server.etags.get(file_path, stat)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            pass
+        else:
+            self.cache_headers = cache_headers(self.server.site.config, self.path, etag, stat)
+
+            if is_not_modified(self.headers.get("If-None-Match"), None, etag, stat):
+                return self.send_not_modified()
+
+        if live_reload_page:
+            return self.send_html_head()
+
+        # This handles If-Modified-Since
+        return super().send_head()
+
+    def send_not_modified(self):
+        self.send_response(httpserver.HTTPStatus.NOT_MODIFIED)
+        self.send_header("Last-Modified", self.cache_headers["Last-Modified"])
+        self.end_headers()
+
+    def send_compressed_head(self, file_path, compressed_path, encoding, stat):
+        etag = self.server.etags.get(compressed_path, stat)
+        self.cache_headers = cache_headers(self.server.site.config, self.path, etag, stat)
+
+        if is_not_modified(self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since"), etag, stat):
+            return self.send_not_modified()
+
+        f = open(compressed_path, "rb")
+
+        self.send_response(httpserver.HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(file_path))
+        self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(stat.st_size))
+        self.send_header("Last-Modified", self.cache_headers["Last-Modified"])
+        self.end_headers()
+
+        return f
+
+    def send_html_head(self):
+        try:
+            with open(self.translate_path(self.path), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.send_error(httpserver.HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        index = data.rfind(b"</body>")
+        index = len(data) if index < 0 else index
+        data = data[:index] + ServerRequestHandler._RELOAD_SCRIPT + data[index:]
+
+        self.send_response(httpserver.HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+
+        return io.BytesIO(data)
+
+    def send_reload_events(self):
+        queue = Queue()
+
+        self.send_response(httpserver.HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        self.server.reload_queues.add(queue)
+
+        try:
+            while not self.server.stopping.is_set():
+                try:
+                    message = queue.get(timeout=1)
+                except Empty:
+                    continue
+
+                self.wfile.write(f"data: {message}\n\n".encode())
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.reload_queues.discard(queue)
+            self.close_connection = True
+
+class AsyncServer:
+    """
+    An asyncio alternative to `Server`.  Output files are sent with
+    non-blocking I/O, using `sendfile` where the platform has it.
+    Renders run in a separate thread, and a request waits only while
+    the file it asks for is still to be rendered.
+    """
+    _MAX_HEAD_SIZE = 64 * 1024
+    _STATUS_LINES = {x: f"HTTP/1.1 {x.value} {x.phrase}\r\n".encode() for x in httpserver.HTTPStatus}
+
+    def __init__(self, site, port, live_reload=False):
+        self.site = site
+        self.live_reload = live_reload
+        self.stopping = threading.Event()
+        self.errors = {}
+        self.reload_queues = set()
+        self.connections = set()  # Connection tasks
+        self.etags = ETagCache()
+
+        self.watcher = None
+        self.poll_task = None
+        self.render_future = None
+        self.render_again = False
+
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="render-thread")
+        self.shutdown_event = asyncio.Event()
+
+        try:
+            self.server = self.loop.run_until_complete \
+                (asyncio.start_server(self.handle_connection, "localhost", port, limit=AsyncServer._MAX_HEAD_SIZE))
+        except BaseException:
+            self.executor.shutdown()
+            self.loop.close()
+            raise
+
+        self.watcher = FileWatcher(site)
+        self.site.debug("Watching for changes using {}", self.watcher.mode)
+
+        self.render()
+
+        if self.watcher.fd is not None:
+            self.loop.add_reader(self.watcher.fd, self.refresh)
+        else:
+            self.poll_task = self.loop.create_task(self.poll())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server_close()
+
+    def serve_forever(self):
+        self.loop.run_until_complete(self.shutdown_event.wait())
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.shutdown_event.set)
+
+    def server_close(self):
+        self.stopping.set()
+
+        if self.watcher.fd is not None:
+            self.loop.remove_reader(self.watcher.fd)
+
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+
+        self.server.close()
+
+        connections = tuple(self.connections)
+
+        for task in connections:
+            task.cancel()
+
+        # With no tasks, gather would make its future on another loop
+        if connections:
+            self.loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.run_until_complete(self.loop.shutdown_default_executor())
+        self.executor.shutdown()
+        self.watcher.close()
+        self.loop.close()
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(0.25)
+
+            if await self.loop.run_in_executor(None, self.watcher.check):
+                self.start_render()
+
+    def refresh(self):
+        """
+        Start a render if any config or input files changed.
+        """
+        if self.watcher.check():
+            self.start_render()
+
+    @property
+    def rendering(self):
+        return self.render_future is not None and not self.render_future.done()
+
+    def start_render(self):
+        # A change during a render means one more render after it
+        if self.rendering:
+            self.render_again = True
+            return
+
+        # Until the render knows which files it will write, requests
+        # wait for it
+        self.site.pending_outputs = None
+
+        self.render_future = self.loop.run_in_executor(self.executor, self.render)
+        self.render_future.add_done_callback(self.render_done)
+
+    def render_done(self, future):
+        if self.render_again and not self.stopping.is_set():
+            self.render_again = False
+            self.start_render()
+
+    def render(self):
+        try:
+            self.site.render()
+        except TransomError as e:
+            self.site.log(f"{colorize('error:', '31;1')} {e}")
+
+        self.errors = {str(f.output_path): e for f, e in list(self.site.worker_errors.queue) if f is not None}
+
+        if self.site.modified_files:
+            message = json.dumps([x.url for x in self.site.modified_files])
+
+            for queue in tuple(self.reload_queues):
+                self.loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def await_output(self, output_path):
+        """
+        Wait until the current render, if any, is done with
+        `output_path`, and return the error it had, if any.
+        """
+        while self.rendering:
+            pending_outputs = self.site.pending_outputs
+
+            if pending_outputs is not None and output_path not in pending_outputs:
+                break
+
+            await asyncio.wait((self.render_future,), timeout=0.01)
+
+        if self.rendering:
+            for input_file, error in list(self.site.worker_errors.queue):
+                if input_file is not None and str(input_file.output_path) == output_path:
+                    return error
+
+            return None
+
+        return self.errors.get(output_path)
+
+    async def handle_connection(self, reader, writer):
+        self.connections.add(asyncio.current_task())
+
+        try:
+            while not self.stopping.is_set():
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                try:
+                    request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                    method, target, version = request_line.split(" ")
+                    headers = {k.strip().lower(): v.strip() for k, v in (x.split(":", 1) for x in header_lines)}
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self.send_error(writer, httpserver.HTTPStatus.BAD_REQUEST, "Bad request")
+                    break
+
+                if length:
+                    await reader.readexactly(length)
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                if not await self.handle_request(writer, method, target, headers):
+                    break
+
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def handle_request(self, writer, method, target, headers):
+        """
+        Send the response to one request.  It returns false if the
+        connection cannot be reused.
+        """
+        if method == "POST":
+            assert target == "/STOP", target
+
+            await self.send_response(writer, httpserver.HTTPStatus.OK, {"Content-Length": "0"})
+            self.shutdown_event.set()
+
+            return False
+
+        if method not in ("GET", "HEAD"):
+            await self.send_error(writer, httpserver.HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({method})")
+            return True
+
+        if self.live_reload and target == ServerRequestHandler._RELOAD_PATH:
+            await self.send_reload_events(writer)
+            return False
+
+        prefix = self.site.config.prefix
+
+        if not target.startswith(prefix):
+            await self.send_response(writer, httpserver.HTTPStatus.TEMPORARY_REDIRECT,
+                                     {"Location": prefix + target, "Content-Length": "0"})
+            return True
+
+        path = urllib.parse.unquote(target.split("?", 1)[0].split("#", 1)[0])
+        path = path + "index.html" if path.endswith("/") else path
+
+        # As in SimpleHTTPRequestHandler.translate_path, empty and "."
+        # segments are dropped.  A path that could leave the output
+        # directory is refused.
+        segments = [x for x in path.removeprefix(prefix).split("/") if x not in ("", ".")]
+
+        if any(x == ".." or "\0" in x or os.path.dirname(x) for x in segments):
+            await self.send_error(writer, httpserver.HTTPStatus.NOT_FOUND, "File not found")
+            return True
+
+        path = "/".join(segments)
+        file_path = self.site.output_dir / path
+        output_dir = str(self.site.output_dir)
+
+        if not os.path.normpath(file_path).startswith(output_dir + os.sep) and str(file_path) != output_dir:
+            await self.send_error(writer, httpserver.HTTPStatus.NOT_FOUND, "File not found")
+            return True
+
+        if self.watcher.fd is not None:
+            self.refresh()
+
+        if error := await self.await_output(str(file_path)):
+            await self.send_error(writer, httpserver.HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+            return True
+
+        if file_path.is_dir():
+            await self.send_response(writer, httpserver.HTTPStatus.MOVED_PERMANENTLY,
+                                     {"Location": target.split("?", 1)[0] + "/", "Content-Length": "0"})
+            return True
+
+        live_reload_page = self.live_reload and path.endswith(".html")
+        content_headers = {"Content-Type": mimetypes.guess_type(path)[0] or "application/octet-stream"}
+        send_path = str(file_path)
+
+        try:
+            if not live_reload_page and (compressed := find_compressed_file(send_path, os.stat(send_path),
+                                                                              headers.get("accept-encoding"))):
+                send_path, content_headers["Content-Encoding"], _ = compressed
+
+            f = open(send_path, "rb")
+        except OSError:
+            await self.send_error(writer, httpserver.HTTPStatus.NOT_FOUND, "File not found")
+            return True
+
+        with f:
+            stat = os.fstat(f.fileno())
+
+            # Hashing a large file would hold up other requests
+            etag = self.etags.cached(send_path, stat) \
+                or await self.loop.run_in_executor(None, self.etags.get, send_path, stat)
+            cache_headers_ = cache_headers(self.site.config, path, etag, stat)
+
+            if is_not_modified(headers.get("if-none-match"), headers.get("if-modified-since"), etag, stat):
+                await self.send_response(writer, httpserver.HTTPStatus.NOT_MODIFIED, cache_headers_)
+                return True
+
+            if live_reload_page:
+                data = await self.loop.run_in_executor(None, f.read)
+                index = data.rfind(b"</body>")
+                index = len(data) if index < 0 else index
+                data = data[:index] + ServerRequestHandler._RELOAD_SCRIPT + data[index:]
+
+                await self.send_response(writer, httpserver.HTTPStatus.OK, cache_headers_ | {
+                    "Content-Type": "text/html",
+                    "Content-Length": str(len(data)),
+                })
+
+                if method == "GET":
+                    writer.write(data)
+
+                return True
+
+            await self.send_response(writer, httpserver.HTTPStatus.OK, cache_headers_ | content_headers | {
+                "Content-Length": str(stat.st_size),
+            })
+
+            if method == "GET" and stat.st_size:
+                await writer.drain()
+                await self.loop.sendfile(writer.transport, f, 0, stat.st_size)
+
+        return True
+
+    async def send_response(self, writer, status, headers):
+        lines = [AsyncServer._STATUS_LINES[status]]
+        headers = headers | {"Cross-Origin-Opener-Policy": "same-origin",
+                             "Cross-Origin-Embedder-Policy": "require-corp"}
+
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}\r\n".encode("latin-1"))
+
+        lines.append(b"\r\n")
+
+        writer.writelines(lines)
+
+    async def send_error(self, writer, status, message):
+        body = httpserver.DEFAULT_ERROR_MESSAGE % {"code": status.value, "message": html_escape(message),
+                                                   "explain": status.description}
+        body = body.encode("utf-8", "replace")
+
+        await self.send_response(writer, status, {"Content-Type": httpserver.DEFAULT_ERROR_CONTENT_TYPE,
+                                                  "Content-Length": str(len(body))})
+        writer.write(body)
+
+    async def send_reload_events(self, writer):
+        queue = asyncio.Queue()
+
+        await self.send_response(writer, httpserver.HTTPStatus.OK,
+                                 {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await writer.drain()
+
+        self.reload_queues.add(queue)
+
+        try:
+            while not self.stopping.is_set():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=1)
+                except TimeoutError:
+                    continue
+
+                writer.write(f"data: {message}\n\n".encode())
+                await writer.drain()
+        finally:
+            self.reload_queues.discard(queue)
+
+class TransomCommand:
+    def __init__(self, home=None):
+        self.home = Path(home) if home is not None else None
+        self.name = "transom"
+
+        self.parser = argparse.ArgumentParser()
+        self.parser.description = "Generate static websites from Markdown and Python"
+        self.parser.formatter_class = argparse.RawDescriptionHelpFormatter
+
+        subparsers = self.parser.add_subparsers(title="subcommands")
+
+        common = argparse.ArgumentParser()
+        common.add_argument("--init-only", action="store_true",
+                            help=argparse.SUPPRESS)
+        common.add_argument("--verbose", action="store_true",
+                            help="Print detailed logging to the console")
+        common.add_argument("--quiet", action="store_true",
+                            help="Print no logging to the console")
+        common.add_argument("--threads", type=int, metavar="COUNT", default=8,
+                            help=f"Use COUNT worker threads or processes (default: 8)")
+        common.add_argument("--workers", metavar="MODE", choices=("thread", "process"), default="thread",
+                            help="Render using worker threads or worker processes (default: thread)")
+        common.add_argument("--output", metavar="OUTPUT-DIR",
+                            help="The output directory (default: SITE-DIR/output)")
+        common.add_argument("site_dir", metavar="SITE-DIR", nargs="?", default=".",
+                            help="The site root directory (default: current directory)")
+
+        init = subparsers.add_parser("init", parents=[common], add_help=False,
+                                     help="Create files and directories for a new project")
+        init.set_defaults(command_fn=self.command_init)
+        init.add_argument("--profile", metavar="PROFILE", choices=("website", "webapp"), default="website",
+                          help="Select starter files for different scenarios (default: website)")
+        init.add_argument("--github", action="store_true",
+                          help="Add extra files for use in a GitHub repo")
+
+        render = subparsers.add_parser("render", parents=[common], add_help=False,
+                                       help="Generate output files")
+        render.set_defaults(command_fn=self.command_render)
+        render.add_argument("-f", "--force", action="store_true",
+                            help="Render all input files, including unchanged ones")
+        render.add_argument("--no-cache", action="store_true",
+                            help="Do not use or update the render cache")
+        render.add_argument("--profile", action="store_true",
+                            help="Print the time spent in each phase, file, and template expression")
+        render.add_argument("--profile-output", metavar="FILE",
+                            help="Write the profile timings to FILE as JSON (implies --profile)")
+        render.add_argument("--check-links", action="store_true",
+                            help="Check the links in the output files after rendering")
+
+        check_links = subparsers.add_parser("check-links", parents=[common], add_help=False,
+                                            help="Check the links in the output files")
+        check_links.set_defaults(command_fn=self.command_check_links)
+
+        serve = subparsers.add_parser("serve", parents=[common], add_help=False,
+                                       help="Generate output files and serve the site on a local port")
+        serve.set_defaults(command_fn=self.command_serve)
+        serve.add_argument("-p", "--port", type=int, metavar="PORT", default=8080,
+                           help="Listen on PORT (default 8080)")
+        serve.add_argument("--live-reload", action="store_true",
+                           help="Reload the browser when its page is rebuilt")
+        serve.add_argument("--server", metavar="MODE", choices=("thread", "async"), default="thread",
+                           help="Handle requests using threads or asyncio (default: thread)")
+
+    def init(self, args=None):
+        self.args = self.parser.parse_args(args)
+
+        if "command_fn" not in self.args:
+            self.parser.print_usage()
+            sys.exit(1)
+
+        self.site = TransomSite(self.args.site_dir, verbose=self.args.verbose, quiet=self.args.quiet,
+                                threads=self.args.threads, cache=not getattr(self.args, "no_cache", False),
+                                workers=self.args.workers)
+
+        if self.args.output:
+            self.site.output_dir = Path(self.args.output)
+
+    def main(self, args=None):
+        try:
+            self.init(args)
+
+            assert self.args is not None
+
+            if self.args.init_only:
+                return
+
+            self.args.command_fn()
+        except TransomError as e:
+            self.fail(str(e))
+        except KeyboardInterrupt: # pragma: nocover
+            pass
+
+    def notice(self, message, *args):
+        self.site.notice(message, *args)
+
+    def fail(self, message, *args):
+        self.site.error(message, *args)
+        sys.exit(1)
+
+    def command_init(self):
+        if self.home is None:
+            self.fail("I can't find the default input files")
+
+        def copy(from_path, to_path):
+            if to_path.exists():
+                self.notice("Skipping '{}'. It already exists.", to_path)
+                return
+
+            to_path.parent.mkdir(parents=True, exist_ok=True)
+
+            if from_path.is_dir():
+                shutil.copytree(from_path, to_path, copy_function=shutil.copy)
+            else:
+                shutil.copy(from_path, to_path)
+
+            self.notice("Creating '{}'", to_path)
+
+        profile_dir = self.home / "profiles" / self.args.profile
+        site_dir = Path(self.args.site_dir)
+
+        assert profile_dir.exists(), profile_dir
+
+        for name in (profile_dir / "config").iterdir():
+            copy(name, site_dir / "config" / name.name)
+
+        for name in (profile_dir / "input").iterdir():
+            copy(name, site_dir / "input" / name.name)
+
+        if self.args.github:
+            copy(profile_dir / ".github", site_dir / ".github")
+            copy(profile_dir / ".gitignore", site_dir / ".gitignore")
+            copy(profile_dir / ".plano.py", site_dir / ".plano.py")
+            copy(profile_dir / "plano", site_dir / "plano")
+            copy(self.home / "python/transom", site_dir / "python/transom")
+            copy(self.home / "python/mistune", site_dir / "python/mistune")
+            copy(self.home / "python/plano", site_dir / "python/plano")
+
+    def command_render(self):
+        if self.args.profile or self.args.profile_output:
+            self.site.profile = RenderProfile()
+
+        with self.site:
+            try:
+                self.site.render(force=self.args.force)
+            finally:
+                if self.site.profile is not None:
+                    print(self.site.profile.report())
+
+                    if self.args.profile_output:
+                        self.site.profile.save(self.args.profile_output)
+
+            if self.args.check_links:
+                self.check_links()
+
+    def command_check_links(self):
+        with self.site:
+            self.check_links()
+
+    def check_links(self):
+        if broken_links := self.site.check_links():
+            self.fail("Found {:,} broken {}", len(broken_links), plural("link", len(broken_links)))
+
+    def command_serve(self):
+        with self.site:
+            self.site.serve(port=self.args.port, live_reload=self.args.live_reload, server=self.args.server)
+
+class HtmlRenderer(mistune.renderers.html.HTMLRenderer):
+    _HTML_ID_RESTRICT_RE = re.compile(r"[^a-z0-9\s-]")
+    _HTML_ID_HYPHENATE_RE = re.compile(r"[-\s]+")
+
+    @staticmethod
+    def html_id(text):
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+        text = HtmlRenderer._HTML_ID_RESTRICT_RE.sub("", text.lower())
+        text = HtmlRenderer._HTML_ID_HYPHENATE_RE.sub("-", text).strip("-")
+
+        return text
+
+    def __call__(self, tokens, state):
+        # The headings of this rendering, as (level, id, text) tuples.
+        # Ids already used elsewhere in the document can be passed in
+        # the "heading_ids" environment entry.
+        self.headings = []
+        self.heading_ids = set(state.env.get("heading_ids", ()))
+
+        return super().__call__(tokens, state)
+
+    def text(self, text):
+        # Prevent the default HTML escaping
+        return text
+
+    def heading(self, text, level, **attrs):
+        id_ = base_id = HtmlRenderer.html_id(text)
+        count = 0
+
+        while id_ in self.heading_ids:
+            count += 1
+            id_ = f"{base_id}-{count}"
+
+        self.heading_ids.add(id_)
+        self.headings.append((level, id_, text))
+
+        return f"<h{level} id=\"{id_}\">{text}</h{level}>\n"
+
+    def block_code(self, code, info=None):
+        lang_attr = f" class=\"language-{info}\"" if info else ""
+        return f"<pre><code{lang_attr}>{html_escape(code)}</code></pre>\n"
+
+class FastHtmlRenderer(HtmlRenderer):
+    """
+    An HTML renderer that finds the method for each token type in a
+    dispatch table, and passes text tokens through without a call.
+    """
+    def __init__(self, escape=False):
+        super().__init__(escape=escape)
+        self.dispatch = {}
+
+    def render_token(self, token, state):
+        type_ = token["type"]
+
+        # Text is passed through as is.  See HtmlRenderer.text.
+        if type_ == "text":
+            return token["raw"]
+
+        try:
+            fn = self.dispatch[type_]
+        except KeyError:
+            fn = self.dispatch[type_] = self._get_method(type_)
+
+        attrs = token.get("attrs")
+
+        if "raw" in token:
+            text = token["raw"]
+        elif "children" in token:
+            text = self.render_tokens(token["children"], state)
+        else:
+            return fn(**attrs) if attrs else fn()
+
+        return fn(text, **attrs) if attrs else fn(text)
+
+    def render_tokens(self, tokens, state):
+        return "".join([self.render_token(x, state) for x in tokens])
+
+class MarkdownLocal(threading.local):
+    # The compiled scanner expressions of each mode, shared by the
+    # parsers of every thread
+    _SCANNERS = {}
+
+    def __init__(self, mode="standard"):
+        plugins = "table", "strikethrough", "def_list"
+
+        if mode == "fast":
+            self.value = mistune.create_markdown(renderer=FastHtmlRenderer(escape=False),
+                                                 plugins=plugins + ("speedup",))
+        else:
+            self.value = mistune.create_markdown(renderer=HtmlRenderer(escape=False), plugins=plugins)
+
+        self.value.block.list_rules += ['table', 'nptable']
+
+        block_scanners, inline_scanners = MarkdownLocal._SCANNERS.setdefault(mode, ({}, {}))
+
+        self.value.block._Parser__sc = block_scanners
+        self.value.inline._Parser__sc = inline_scanners
+
+    def convert(self, text):
+        """
+        Convert `text` from Markdown to HTML.  It returns the HTML and
+        a tuple of the (level, id, text) headings it contains.
+        """
+        html = self.value(text)
+        return html, tuple(self.value.renderer.headings)
+
+MarkdownLocal.INSTANCE = MarkdownLocal()
+MarkdownLocal.FAST = MarkdownLocal("fast")
+
+MARKDOWN_MODES = {
+    "standard": MarkdownLocal.INSTANCE,
+    "fast": MarkdownLocal.FAST,
+}
+
+LIPSUM_WORDS = (
+    "lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "vestibulum", "enim", "urna",
+    "ornare", "pellentesque", "felis", "eget", "maximus", "lacinia", "lorem", "nulla", "auctor", "massa", "vitae",
+    "ultricies", "varius", "curabitur", "consectetur", "lacus", "sapien", "a", "lacinia", "urna", "tempus", "quis",
+    "vestibulum", "vitae", "augue", "non", "augue", "lobortis", "semper", "nullam", "fringilla", "odio", "quis",
+    "ligula", "consequat", "condimentum", "integer", "tempus", "sem",
+)
+
+def colorize(text, code):
+    return text if "NO_COLOR" in os.environ else f"\u001b[{code}m{text}\u001b[0m"
+
+def normalize_content(content):
+    if content is None:
+        return ""
+
+    if not isinstance(content, (str, int, float, complex, bool)):
+        content = "".join(str(x) for x in content if x is not None)
+
+    return str(content)
+
+def same_content(path1, path2, chunk_size=64 * 1024):
+    if os.stat(path1).st_size != os.stat(path2).st_size:
+        return False
+
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        while True:
+            chunk1, chunk2 = f1.read(chunk_size), f2.read(chunk_size)
+
+            if chunk1 != chunk2:
+                return False
+
+            if not chunk1:
+                return True
+
+def plain_text(text):
+    """
+    Return `text` without its HTML tags and character references.
+    """
+    return None if text is None else html.unescape(re.sub(r"<[^>]*>", "", text)).strip()
+
+def w3c_datetime(mtime_ns):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime((mtime_ns or 0) // 1_000_000_000))
+
+def remove_output(path):
+    """
+    Remove the output file at `path` and its compressed copies.
+    """
+    path.unlink(missing_ok=True)
+
+    for suffix, compress in COMPRESSION_CODECS.values():
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+_MARKDOWN_FENCE_RE = re.compile(r" {0,3}(`{3,}(?=[^`]*$)|~{3,})")
+_MARKDOWN_HTML_BLOCK_RES = (
+    (re.compile(r"(?i) {0,3}<(?:script|pre|style|textarea)(?:[\s>]|$)"), re.compile(r"(?i)</(?:script|pre|style|textarea)>")),
+    (re.compile(r" {0,3}<!--"), re.compile(r"-->")),
+    (re.compile(r" {0,3}<\?"), re.compile(r"\?>")),
+    (re.compile(r" {0,3}<!\[CDATA\["), re.compile(r"\]\]>")),
+    (re.compile(r" {0,3}<![a-zA-Z]"), re.compile(r">")),
+)
+_MARKDOWN_CONTINUATION_RE = re.compile(r"[ \t>]|[-+*:](?:[ \t]|$)|\d{1,9}[.)](?:[ \t]|$)")
+_MARKDOWN_DEFINITION_RE = re.compile(r":[ \t]")
+
+def split_markdown(text):
+    """
+    Split Markdown `text` into segments of top-level blocks that
+    convert to the same HTML apart as together.  A segment starts
+    only after a blank line, at an unindented line that can't continue
+    a list, a block quote, a definition list, a fenced code block, or
+    a multi-line HTML block.  Anything doubtful stays in the current
+    segment.
+    """
+    lines = text.splitlines(keepends=True)
+    segments = []
+    start = 0
+    fence = None
+    html_end_re = None
+    blank = False
+    definitions = False
+
+    def continues_definitions(i):
+        # A definition list takes a following term and its
+        # definitions, with at most one blank line between them
+        for j in range(i, len(lines)):
+            if _MARKDOWN_DEFINITION_RE.match(lines[j]):
+                return True
+
+            if not lines[j].strip():
+                return j + 1 < len(lines) and _MARKDOWN_DEFINITION_RE.match(lines[j + 1]) is not None
+
+        return False
+
+    for i, line in enumerate(lines):
+        if fence is not None:
+            if (match := _MARKDOWN_FENCE_RE.match(line)) and match.group(1)[0] == fence[0] \
+               and len(match.group(1)) >= fence[1] and not line[match.end():].strip():
+                fence = None
+
+            continue
+
+        if html_end_re is not None:
+            if html_end_re.search(line):
+                html_end_re = None
+
+            continue
+
+        if not line.strip():
+            blank = True
+            continue
+
+        if blank and not _MARKDOWN_CONTINUATION_RE.match(line) \
+           and not (definitions and continues_definitions(i)):
+            segments.append("".join(lines[start:i]))
+            start = i
+            definitions = False
+
+        blank = False
+
+        if _MARKDOWN_DEFINITION_RE.match(line):
+            definitions = True
+
+        if match := _MARKDOWN_FENCE_RE.match(line):
+            fence = match.group(1)[0], len(match.group(1))
+            continue
+
+        for start_re, end_re in _MARKDOWN_HTML_BLOCK_RES:
+            if match := start_re.match(line):
+                if not end_re.search(line, match.end()):
+                    html_end_re = end_re
+
+                break
+
+    segments.append("".join(lines[start:]))
+
+    return segments
+
+def write_output(output_path, chunks):
+    """
+    Write `chunks` of text to a temporary file and then move it into
+    place, so a failed render never leaves a partial file behind.  An
+    identical existing output is kept as is.
+    """
+    temp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        with open(temp_path, "w", buffering=64 * 1024) as f:
+            f.writelines(chunks)
+
+        replace_if_changed(temp_path, output_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+def replace_if_changed(temp_path, output_path):
+    """
+    Move `temp_path` to `output_path` unless the output already has
+    the same content.  This keeps the mtimes of unchanged outputs, so
+    rsync and CDN syncs see no change.
+    """
+    try:
+        if same_content(temp_path, output_path):
+            os.remove(temp_path)
+            return False
+    except FileNotFoundError:
+        pass
+
+    os.replace(temp_path, output_path)
+
+    return True
+
+def clone_file(from_path, to_path):
+    with open(from_path, "rb") as source, open(to_path, "wb") as target:
+        if fcntl is not None:
+            try:
+                # FICLONE from linux/fs.h
+                fcntl.ioctl(target.fileno(), 0x40049409, source.fileno())
+                return
+            except OSError:
+                pass
+
+        # copy_file_range shares extents on file systems that support
+        # it and copies in the kernel otherwise
+        try:
+            while os.copy_file_range(source.fileno(), target.fileno(), 1024 * 1024 * 1024):
+                pass
+        except (AttributeError, OSError):
+            # Start over after a partial copy
+            target.seek(0)
+            target.truncate(0)
+            source.seek(0)
+            shutil.copyfileobj(source, target)
+
+def place_file(from_path, to_path, strategy="copy"):
+    """
+    Put the file at `from_path` at `to_path` using `strategy`, one of
+    `copy`, `hardlink`, `reflink`, or `symlink`.  Nothing is written if
+    `to_path` already has the same content or link.
+    """
+    temp_path = to_path.with_name(f".{to_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    try:
+        match strategy:
+            case "copy" | "reflink":
+                if to_path.exists() and not to_path.is_symlink() and same_content(from_path, to_path):
+                    return False
+
+                if strategy == "reflink":
+                    clone_file(from_path, temp_path)
+                else:
+                    shutil.copyfile(from_path, temp_path)
+
+                shutil.copymode(from_path, temp_path)
+            case "hardlink":
+                if to_path.exists() and os.path.samefile(from_path, to_path):
+                    return False
+
+                try:
+                    os.link(from_path, temp_path)
+                except OSError: # pragma: nocover
+                    # Different file systems
+                    shutil.copy(from_path, temp_path)
+            case "symlink":
+                target = os.path.abspath(from_path)
+
+                if to_path.is_symlink() and os.readlink(to_path) == target:
+                    return False
+
+                os.symlink(target, temp_path)
+            case _:
+                raise TransomError(f"Unknown copy strategy: {strategy}")
+
+        os.replace(temp_path, to_path)
+    except BaseException:
+        if temp_path.is_symlink() or temp_path.exists():
+            temp_path.unlink()
+
+        raise
+
+    return True
+
+_CSS_TOKEN_RE = re.compile(r"""(?s)("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|/\*.*?\*/|url\((?:\\.|[^)"'\\])*\))""")
+_CSS_SPACE_RE = re.compile(r"\s+")
+_CSS_PUNCTUATION_RE = re.compile(r" ?([{};,>]) ?")
+
+def minify_css(text) -> str:
+    """
+    Strip comments and needless whitespace from CSS.  Strings, URLs,
+    and `/*! ... */` comments are kept as is.
+    """
+    result = []
+    buffer = []
+
+    def flush():
+        code = _CSS_SPACE_RE.sub(" ", "".join(buffer))
+        code = _CSS_PUNCTUATION_RE.sub(r"\1", code)
+        result.append(code.replace(": ", ":").replace(";}", "}"))
+        buffer.clear()
+
+    for i, token in enumerate(_CSS_TOKEN_RE.split(text)):
+        if i % 2 == 0:
+            buffer.append(token)
+        elif token.startswith("/*") and not token.startswith("/*!"):
+            continue
+        else:
+            flush()
+            result.append(token)
+
+    flush()
+
+    return "".join(result).strip()
+
+_JS_REGEX_PRECEDERS = frozenset("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = frozenset(("return", "typeof", "case", "do", "else", "in", "instanceof", "new", "delete", "void",
+                                "throw", "yield", "await", "of"))
+_JS_WORD_RE = re.compile(r"[\w$]+")
+_JS_SPACE_RE = re.compile(r"\s+")
+
+def _js_string_end(text, i):
+    quote = text[i]
+    i += 1
+
+    while i < len(text):
+        c = text[i]
+
+        if c == "\\":
+            i += 2
+        elif c == quote:
+            return i + 1
+        elif quote == "`" and text.startswith("${", i):
+            i = _js_code_end(text, i + 2)
+        elif c == "\n" and quote != "`":
+            return i
+        else:
+            i += 1
+
+    return i
+
+def _js_code_end(text, i):
+    # The end of a template literal substitution
+    depth = 1
+
+    while i < len(text):
+        c = text[i]
+
+        if c in "\"'`":
+            i = _js_string_end(text, i)
+            continue
+
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+
+            if depth == 0:
+                return i + 1
+
+        i += 1
+
+    return i
+
+def _js_regex_end(text, i):
+    in_class = False
+    i += 1
+
+    while i < len(text):
+        c = text[i]
+
+        if c == "\\":
+            i += 2
+            continue
+
+        if c == "\n":
+            return None
+        elif c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+
+            while i < len(text) and (text[i].isalnum() or text[i] == "_"):
+                i += 1
+
+            return i
+
+        i += 1
+
+    return None
+
+def minify_js(text) -> str:
+    """
+    Strip comments, indentation, and blank lines from JavaScript.
+    Line breaks are kept, so automatic semicolon insertion is
+    unaffected.  Strings, template literals, regular expressions, and
+    `/*! ... */` comments are kept as is.
+    """
+    result = []
+    previous = ""
+    previous_word = ""
+    i = 0
+
+    def add_space(space):
+        if not result:
+            return
+
+        if result[-1] in (" ", "\n"):
+            if space == "\n":
+                result[-1] = space
+        else:
+            result.append(space)
+
+    while i < len(text):
+        c = text[i]
+
+        if c in "\"'`":
+            end = _js_string_end(text, i)
+            result.append(text[i:end])
+            previous, i = c, end
+        elif c == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = len(text) if end < 0 else end
+        elif c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = len(text) if end < 0 else end + 2
+
+            if text.startswith("/*!", i):
+                result.append(text[i:end])
+            else:
+                add_space("\n" if "\n" in text[i:end] else " ")
+
+            i = end
+        elif c == "/" and (previous in _JS_REGEX_PRECEDERS or previous == ""
+                           or (previous == "w" and previous_word in _JS_REGEX_KEYWORDS)) \
+                and (end := _js_regex_end(text, i)) is not None:
+            result.append(text[i:end])
+            previous, i = "/", end
+        elif c.isspace():
+            end = _JS_SPACE_RE.match(text, i).end()
+            add_space("\n" if "\n" in text[i:end] else " ")
+            i = end
+        elif match := _JS_WORD_RE.match(text, i):
+            result.append(match.group())
+            previous, previous_word, i = "w", match.group(), match.end()
+        else:
+            result.append(c)
+            previous, i = c, i + 1
+
+    # A space between a word and punctuation can go.  Spaces between
+    # two words or two punctuation characters (as in "a - -b") stay,
+    # and so do spaces next to dots (as in "1 .toString()").
+    def is_word(c):
+        return c.isalnum() or c in "_$\\" or ord(c) > 127
+
+    for i in range(len(result) - 2, 0, -1):
+        if result[i] == " ":
+            before, after = result[i - 1][-1], result[i + 1][0]
+
+            if is_word(before) != is_word(after) and "." not in (before, after):
+                del result[i]
+
+    return "".join(result).strip()
+
+_HTML_TOKEN_RE = re.compile(r"""(?is)<!--.*?-->|<(pre|textarea|script|style)\b(?:"[^"]*"|'[^']*'|[^'">])*>.*?</\1\s*>"""
+                            r"""|<(?:"[^"]*"|'[^']*'|[^'">])*>""")
+_HTML_SPACE_RE = re.compile(r"\s+")
+_HTML_SCRIPT_TYPE_RE = re.compile(r"""(?i)\btype\s*=\s*["']?([^"'\s>]+)""")
+
+def minify_html(text) -> str:
+    """
+    Strip comments and collapse whitespace in HTML.  Whitespace runs
+    become a single space or line break.  The content of `pre` and
+    `textarea` elements is kept as is, and that of `style` and
+    `script` elements is minified as CSS and JavaScript.
+    """
+    result = []
+    buffer = []
+
+    def flush():
+        result.append(_HTML_SPACE_RE.sub(lambda x: "\n" if "\n" in x.group() else " ", "".join(buffer)))
+        buffer.clear()
+
+    position = 0
+
+    for match in _HTML_TOKEN_RE.finditer(text):
+        buffer.append(text[position:match.start()])
+        position = match.end()
+        token = match.group()
+
+        if token.startswith("<!--"):
+            # Conditional and marked comments stay
+            if token.startswith(("<!--[", "<!--!")):
+                flush()
+                result.append(token)
+
+            continue
+
+        flush()
+
+        match match.group(1) and match.group(1).lower():
+            case "style":
+                start, end = token.index(">") + 1, token.rindex("<")
+                token = token[:start] + minify_css(token[start:end]) + token[end:]
+            case "script":
+                start, end = token.index(">") + 1, token.rindex("<")
+                type_ = _HTML_SCRIPT_TYPE_RE.search(token[:start])
+
+                if type_ is None or type_.group(1).lower() in ("module", "text/javascript", "application/javascript"):
+                    token = token[:start] + minify_js(token[start:end]) + token[end:]
+
+        result.append(token)
+
+    buffer.append(text[position:])
+    flush()
+
+    return "".join(result).strip() + "\n"
+
+MINIFIERS = {
+    ".css": minify_css,
+    ".html": minify_html,
+    ".js": minify_js,
+}
+
+_CSS_IMPORT_RE = re.compile(r"""(?m)^[ \t]*@import\s+(?:url\(\s*(["']?)(.*?)\1\s*\)|(["'])(.*?)\3)\s*([^;]*);[ \t]*\n?""")
+_CSS_CHARSET_RE = re.compile(r"""(?m)^[ \t]*@charset\s+["'][^"']*["']\s*;[ \t]*\n?""")
+_CSS_REMOTE_URL_RE = re.compile(r"(?i)^(?:[a-z][a-z0-9+.-]*:|//)")
+_CSS_URL_RE = re.compile(r"""(?i)\burl\(\s*(["']?)(.*?)\1\s*\)""")
+
+def _css_import_conditions(conditions):
+    # Split "layer(x) supports(y) media" into its parts
+    layer = supports = None
+
+    if match := re.match(r"layer(?:\(([^)]*)\))?\s*", conditions):
+        layer, conditions = match.group(1) or "", conditions[match.end():]
+
+    if conditions.startswith("supports("):
+        depth = 0
+
+        for i, c in enumerate(conditions):
+            depth += (c == "(") - (c == ")")
+
+            if depth == 0 and c == ")":
+                supports, conditions = conditions[9:i], conditions[i + 1:].strip()
+                break
+
+    return layer, supports, conditions
+
+def bundle_css(paths, base_dir=None) -> str:
+    """
+    Join the CSS files at `paths` in order.  Local `@import` rules are
+    replaced by the content of the imported file, wrapped in `@layer`,
+    `@supports`, and `@media` rules for any import conditions.  Each
+    file is included only once.  Remote imports move to the top.  If
+    `base_dir` is set, relative `url()` references are rewritten to
+    be relative to it instead of their own file.
+    """
+    remote_imports = []
+    included = set()
+
+    def load(path):
+        path = os.path.abspath(path)
+
+        if path in included:
+            return ""
+
+        included.add(path)
+        record_dependency(path)
+
+        with open(path) as f:
+            text = _CSS_CHARSET_RE.sub("", f.read())
+
+        def replace(match):
+            url = match.group(2) if match.group(2) is not None else match.group(4)
+
+            if _CSS_REMOTE_URL_RE.match(url):
+                if (rule := match.group().strip()) not in remote_imports:
+                    remote_imports.append(rule)
+
+                return ""
+
+            content = load(os.path.join(os.path.dirname(path), url)).rstrip() + "\n"
+            layer, supports, media = _css_import_conditions(match.group(5).strip())
+
+            if media:
+                content = f"@media {media} {{\n{content}}}\n"
+
+            if supports is not None:
+                content = f"@supports ({supports}) {{\n{content}}}\n"
+
+            if layer is not None:
+                content = f"@layer {layer} {{\n{content}}}\n".replace("@layer  {", "@layer {")
+
+            return content
+
+        def rebase(text):
+            if base_dir is None:
+                return text
+
+            def replace_url(match):
+                url = match.group(2)
+
+                if not url or url.startswith(("/", "#")) or _CSS_REMOTE_URL_RE.match(url):
+                    return match.group()
+
+                url = os.path.relpath(os.path.join(os.path.dirname(path), url), base_dir).replace(os.sep, "/")
+
+                return f"url({match.group(1)}{url}{match.group(1)})"
+
+            return _CSS_URL_RE.sub(replace_url, text)
+
+        # The imported files are rebased as they load, so only the
+        # text between the imports is rebased here
+        parts, start = [], 0
+
+        for match in _CSS_IMPORT_RE.finditer(text):
+            parts += rebase(text[start:match.start()]), replace(match)
+            start = match.end()
+
+        return "".join(parts) + rebase(text[start:])
+
+    parts = [load(x).strip() + "\n" for x in paths]
+
+    return "".join(x + "\n" for x in remote_imports) + "\n".join(parts)
+
+def bundle_js(paths) -> str:
+    """
+    Join the JavaScript files at `paths` in order.  The files are
+    separated by semicolons, so a file without a final semicolon
+    can't run into the next.
+    """
+    parts = []
+
+    for path in paths:
+        record_dependency(path)
+
+        with open(path) as f:
+            parts.append(f.read().rstrip() + "\n")
+
+    return ";\n".join(parts)
+
+def include(path) -> str:
+    """
+    Return the content of the file at `path`.
+    """
+    path = Path(path) if isinstance(path, str) else path
+    record_dependency(path)
+    return path.read_text()
+
+def convert_markdown(content) -> str:
+    """
+    Convert `content` from Markdown to HTML.
+    """
+    return MarkdownLocal.INSTANCE.value(normalize_content(content))
+
+def strip(content) -> str:
+    """
+    Remove leading and trailing whitespace from `content`.
+    """
+    return normalize_content(content).strip()
+
+def plural(noun, count=0, plural=None) -> str:
+    """
+    Return the plural form of `noun` if `count` is not 1.  Set the
+    plural form explicitly with `plural` if it's not a simple matter of
+    adding `s` or `es`.
+    """
+    if noun in (None, ""):
+        return ""
+
+    if count == 1:
+        return noun
+
+    if plural is None:
+        if noun.endswith("s"):
+            plural = "{}ses".format(noun)
+        else:
+            plural = "{}s".format(noun)
+
+    return plural
+
+def lipsum(count=50, end=".") -> str:
+    """
+    Generate lorem ipsum filler text.
+    """
+    return (" ".join((LIPSUM_WORDS[i % len(LIPSUM_WORDS)] for i in range(count))) + end).capitalize()
+
+def html_escape(content) -> str:
+    """
+    Escape HTML special characters in `text`.
+    """
+    return html.escape(normalize_content(content), quote=False)
+
+def html_elem(tag, content, **attrs):
+    attrs = "".join(html_attrs(attrs))
+    return f"<{tag}{attrs}>{normalize_content(content)}</{tag}>"
+
+def html_attrs(attrs):
+    for name, value in attrs.items():
+        name = "class" if name in ("class_", "_class") else name
+        value = name if value is True else value
+
+        if value is not False:
+            yield f" {name}=\"{html.escape(value)}\""
+
+# item_fn(index, value) -> "<li>...</li>"
+def html_list(data, tag="ul", item_fn=None, **attrs) -> str:
+    """
+    Generate an HTML list from 'data'.
+    """
+    if item_fn is None:
+        item_fn = lambda index, value: html_elem("li", value)
+
+    items = (item_fn(i, v) for i, v in enumerate(data))
+
+    return html_elem(tag, items, **attrs)
+
+def html_list_csv(path, tag="ul", item_fn=None, **attrs) -> str:
+    """
+    Generate an HTML list with CSV data loaded from 'path'.
+    """
+    record_dependency(path)
+
+    with open(path, newline="") as f:
+        return html_list(csv.reader(f), tag=tag, item_fn=item_fn, **attrs)
+
+# item_fn(row_index, column_index, value) -> "<td>...</td>"
+# heading_fn(column_index, value) -> "<th>...</th>"
+def html_table(data, headings=None, item_fn=None, heading_fn=None, **attrs) -> str:
+    """
+    Generate an HTML table from 'data'.
+    """
+    if item_fn is None:
+        item_fn = lambda row_index, column_index, value: html_elem("td", value)
+
+    if heading_fn is None:
+        heading_fn = lambda column_index, value: html_elem("th", value)
+
+    thead = None
+    trows = (html_elem("tr", (item_fn(ri, ci, x) for ci, x in enumerate(row))) for ri, row in enumerate(data))
+
+    if headings:
+        thead = html_elem("thead", html_elem("tr", (heading_fn(i, x) for i, x in enumerate(headings))))
+
+    return html_elem("table", (thead, html_elem("tbody", trows)), **attrs)
+
+def html_table_csv(path, headings=None, item_fn=None, heading_fn=None, **attrs) -> str:
+    """
+    Generate an HTML table with CSV data loaded from 'path'.
+    """
+    record_dependency(path)
+
+    with open(path, newline="") as f:
+        return html_table(csv.reader(f), headings=headings, item_fn=item_fn, heading_fn=heading_fn, **attrs)
+
+if __name__ == "__main__": # pragma: nocover
+    command = TransomCommand()
+    command.main()
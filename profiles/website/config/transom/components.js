@@ -33,3 +33,123 @@ window.addEventListener("load", () => {
 
     window.addEventListener("hashchange", updateHeadingSelection);
 });
+
+// The site script is at the top of the site, under any site prefix.
+// It is only known while the script runs, not in the event handlers.
+const transomSiteScriptUrl = document.currentScript?.src ?? `${window.location.origin}/site.js`;
+
+window.addEventListener("load", () => {
+    const input = $("input.transom-search");
+
+    if (!input) {
+        return;
+    }
+
+    // The index is split into shards by the first two characters of
+    // each term.  Shards are fetched as they are needed.  By default
+    // the index is beside the site script.
+    const indexUrl = input.dataset.index ?? new URL("_transom/search", transomSiteScriptUrl).href;
+    const shards = new Map();
+    let pages = null;
+    let results = $(".transom-search-results");
+    let currQuery = null;
+
+    if (!results) {
+        results = document.createElement("ol");
+        results.className = "transom-search-results";
+        input.after(results);
+    }
+
+    const fetchJson = (name) => {
+        return fetch(`${indexUrl}/${encodeURIComponent(name)}.json`)
+            .then((response) => response.ok ? response.json() : {})
+            .catch(() => ({}));
+    };
+
+    // Terms are normalized as they are in the index: no accents, in
+    // lowercase, and at least two characters long
+    const parseTerms = (text) => {
+        return text.normalize("NFKD").replace(/[\u0300-\u036f]/g, "").toLowerCase()
+            .split(/[^\p{L}\p{N}_]+/u).filter((term) => Array.from(term).length >= 2);
+    };
+
+    // Every term must match.  The last term also matches longer
+    // terms, so results show up while typing.
+    const search = async (query) => {
+        const terms = parseTerms(query);
+        let scores = null;
+
+        if (terms.length === 0) {
+            return [];
+        }
+
+        pages ??= fetchJson("pages");
+
+        for (const [i, term] of terms.entries()) {
+            const shardName = Array.from(term).slice(0, 2).join("");
+
+            if (!shards.has(shardName)) {
+                shards.set(shardName, fetchJson(shardName));
+            }
+
+            const shard = await shards.get(shardName);
+            const termScores = new Map();
+
+            for (const [key, postings] of Object.entries(shard)) {
+                if (key === term || (i === terms.length - 1 && key.startsWith(term))) {
+                    for (let j = 0; j < postings.length; j += 2) {
+                        termScores.set(postings[j], (termScores.get(postings[j]) ?? 0) + postings[j + 1]);
+                    }
+                }
+            }
+
+            if (scores === null) {
+                scores = termScores;
+                continue;
+            }
+
+            for (const [id, score] of scores) {
+                if (termScores.has(id)) {
+                    scores.set(id, score + termScores.get(id));
+                } else {
+                    scores.delete(id);
+                }
+            }
+        }
+
+        const pageData = await pages;
+
+        return Array.from(scores).sort((a, b) => b[1] - a[1]).slice(0, 20)
+            .map(([id]) => pageData[id]).filter((page) => page);
+    };
+
+    const updateResults = async () => {
+        const query = input.value;
+
+        currQuery = query;
+
+        const matches = await search(query);
+
+        // A later query may have finished first
+        if (query !== currQuery) {
+            return;
+        }
+
+        results.replaceChildren(...matches.map(([url, title]) => {
+            const item = document.createElement("li");
+            const link = document.createElement("a");
+
+            link.href = url;
+            link.textContent = title || url;
+            item.append(link);
+
+            return item;
+        }));
+    };
+
+    input.addEventListener("input", updateResults);
+
+    if (input.value) {
+        updateResults();
+    }
+});
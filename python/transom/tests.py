@@ -18,12 +18,19 @@
 #
 
 import csv
+import gzip
+import json
+import os
 import threading
+import types
 
+from http.client import HTTPConnection
 from plano import *
 from xml.etree.ElementTree import XML
 
-from .main import TransomError, TransomSite, TransomCommand, lipsum, plural, html_table, html_table_csv
+from . import main as transom_main
+from .main import TransomError, TransomSite, TransomCommand, FileWatcher, RenderProfile, Template, lipsum, plural, html_table, html_table_csv, \
+    minify_css, minify_js, minify_html, MarkdownBlocks, MarkdownLocal, split_markdown
 
 TRANSOM_HOME = get_parent_dir(get_parent_dir(get_parent_dir(__file__)))
 RESULT_FILE = "output/result.json"
@@ -72,9 +79,9 @@ class standard_test_site(standard_test_site_dir):
         self.site.stop()
 
 class test_server:
-    def __init__(self, site):
+    def __init__(self, site, server="thread"):
         def run_():
-            site.serve(port=9191)
+            site.serve(port=9191, server=server)
 
         self.server = threading.Thread(target=run_, name="test-server-thread")
 
@@ -177,38 +184,1143 @@ def site_render():
     #         site.load_input_files()
 
 @test
-def site_serve():
+def site_render_incremental():
+    def rendered():
+        return sorted(x.output_path.name for x in site.modified_files)
+
     with empty_test_site() as site:
-        with test_server(site):
-            with expect_exception():
-                http_get("http://localhost:9191/")
+        write("config/body.html", "{{path_nav()}} @content@")
+        write("config/snippet.html", "Snippet")
+        write("input/index.md", "# Top\n")
+        write("input/a.md", "{{include('config/snippet.html')}}\n")
+        write("input/b.md", "# B\n")
+        write("input/c.md", "{{render_template('config/snippet.html')}}\n")
 
-    with standard_test_site() as site:
-        with test_server(site):
-            http_get("http://localhost:9191/")
-            http_get("http://localhost:9191/site.css")
-            http_get("http://localhost:9191/outer/inner/nested.html")
+        site.render()
+        assert rendered() == ["a.html", "b.html", "c.html", "index.html"], rendered()
+
+        # No changes
+        input_files = site.render()
+        assert rendered() == [], rendered()
+
+        # Unchanged pages don't get a copy of the site variables
+        assert all(x._variables is None for x in input_files), input_files
+
+        # An included file changed
+        touch("config/snippet.html")
+
+        site.render()
+        assert rendered() == ["a.html", "c.html"], rendered()
+
+        # A parent title used by path_nav changed
+        write("input/index.md", "---\npage.title = \"New top\"\n---\n# Top\n")
+
+        site.render()
+        assert "b.html" in rendered(), rendered()
+        assert "New top" in read("output/b.html"), read("output/b.html")
+
+        # A page template changed
+        write("config/body.html", "{{path_nav()}} <main>@content@</main>")
+
+        site.render()
+        assert rendered() == ["a.html", "b.html", "c.html", "index.html"], rendered()
+
+@test
+def site_render_navigation():
+    def write_site():
+        write("config/body.html", "{{path_nav()}} {{site_nav()}} @content@")
+        write("input/index.md", "---\npage.title = \"Top\"\n---\n")
+        write("input/a/index.md", "---\npage.title = \"A\"\n---\n")
+        write("input/a/one.md", "---\npage.title = \"One\"\n---\n")
+        write("input/a/two.md", "---\npage.title = \"Two\"\n---\n")
+        write("input/a/b/index.md", "---\npage.title = \"B\"\n---\n")
+        write("input/c/index.md", "---\npage.title = \"C\"\n---\n")
+
+    site_nav = ("<nav class=\"transom-site-nav\"><ul><li><a href=\"/index.html\">Top</a><ul>"
+                "<li><a href=\"/a/index.html\">A</a><ul><li><a href=\"/a/b/index.html\">B</a></li></ul></li>"
+                "<li><a href=\"/c/index.html\">C</a></li></ul></li></ul></nav>")
 
     with empty_test_site() as site:
-        with test_server(site):
-            write("input/outer/inner/new-file.html", "<html/>")
+        write_site()
+
+        input_files = {str(x.output_path.relative_to(site.output_dir)): x for x in site.render()}
+
+        result = read("output/a/one.html")
+        assert "<nav class=\"transom-page-path\"><a href=\"/index.html\">Top</a><a href=\"/a/index.html\">A</a>" \
+            "<a href=\"/a/one.html\">One</a></nav>" in result, result
+        assert site_nav in result, result
+
+        # Sibling pages share the links of their parents
+        one, two = input_files["a/one.html"], input_files["a/two.html"]
+        assert one.path_links()[:2] == two.path_links()[:2]
+        assert one.parent.path_links() is two.parent.path_links()
+
+        # A title change in the chain replaces the shared links
+        one.parent.parent.config.title = "New top"
+
+        assert one.path_links()[0] == "<a href=\"/index.html\">New top</a>", one.path_links()
+        assert one.path_nav(start=1) == "<nav class=\"transom-page-path\"><a href=\"/a/index.html\">A</a>" \
+            "<a href=\"/a/one.html\">One</a></nav>"
+        assert one.path_nav(end=-1, min=3) == ""
+
+        # Pages using site_nav depend on every index file
+        touch("input/c/index.md")
+
+        site.render()
+        assert "a/one.html" in [str(x.output_path.relative_to(site.output_dir)) for x in site.modified_files]
 
-            http_get("http://localhost:9191/outer/inner/new-file.html")
+        # A new index file changes the navigation of the other pages
+        write("input/c/d/page.md", "---\npage.title = \"Page\"\n---\n")
+
+        site.render()
+
+        write("input/c/d/index.md", "---\npage.title = \"D\"\n---\n")
+
+        site.render()
+
+        assert "<a href=\"/c/d/index.html\">D</a>" in read("output/a/one.html")
+        assert "<a href=\"/c/d/index.html\">D</a><a href=\"/c/d/page.html\">Page</a>" in read("output/c/d/page.html")
+
+    with empty_test_site_dir():
+        write_site()
+
+        with TransomSite(".", threads=2, workers="process") as site:
+            site.render()
+
+            result = read("output/a/b/index.html")
+            assert site_nav in result, result
+
+            write("input/c/d/index.md", "---\npage.title = \"D\"\n---\n")
+
+            site.render()
+
+            assert "<a href=\"/c/d/index.html\">D</a>" in read("output/a/one.html")
+
+@test
+def site_render_cache():
+    def cache_entries():
+        return [x for x in find(".transom/output/cache") if is_file(x)]
 
     with empty_test_site() as site:
-        with test_server(site):
-            write("input/broken-file.md", "{{1 / 0}}")
+        write("input/index.md", "# Top\n\n{{1 + 1}}\n")
+
+        site.render()
+
+        entries = cache_entries()
+        assert entries, entries
+
+        # A fresh checkout with identical content
+        remove("output/index.html")
+        touch("input/index.md")
+
+        site.render()
+
+        assert cache_entries() == entries, cache_entries()
+        assert "<p>2</p>" in read("output/index.html"), read("output/index.html")
+
+        # Unreadable entries are misses
+        for entry in entries:
+            write(entry, "Garbage")
+
+        remove("output/index.html")
+        touch("input/index.md")
+
+        site.render()
 
-            with expect_error():
-                http_get("http://localhost:9191/broken-file.html")
+        assert "<p>2</p>" in read("output/index.html"), read("output/index.html")
 
+        # Eviction
+        site.config.cache_size = 0
+
+        write("input/index.md", "# Changed\n")
+
+        site.render()
+
+        assert cache_entries() == [], cache_entries()
+
+        # The state is kept outside the output directory
+        assert not exists("output/.transom")
+        check_file(".transom/output/dependencies.json")
+
+    # Other files in a custom cache directory
     with empty_test_site() as site:
-        write("config/site.py", "site.prefix = \"/prefix\"\n")
-        write("input/index.md", "# Test\n")
+        write("config/site.py", "site.cache_dir = \"cache\"\nsite.cache_size = 0\n")
+        write("cache/README.txt", "Cache")
+        write("input/index.md", "# Top\n")
+
+        site.render()
+
+        check_file("cache/README.txt")
+
+    with empty_test_site_dir():
+        write("input/index.md", "# Top\n")
+
+        call_transom_command(["render", "--no-cache"])
+
+        check_file("output/index.html")
+        assert not exists(".transom/output/cache")
+
+@test
+def site_render_atomic_writes():
+    with empty_test_site() as site:
+        write("input/test.md", "# Test\n")
+
+        site.render()
+
+        original = read("output/test.html")
+
+        write("input/test.md", "# Test\n\n{{lipsum(10000)}}\n\n{{1 / 0}}\n")
+
+        with expect_exception(TransomError):
+            site.render()
+
+        assert read("output/test.html") == original, read("output/test.html")
+        assert list_dir("output", "*.tmp") == [], list_dir("output")
+
+@test
+def function_clone_file():
+    with working_dir():
+        write("a.bin", "abc" * 100_000)
+
+        copy_file_range, fcntl = getattr(os, "copy_file_range", None), transom_main.fcntl
+        calls = []
+
+        # A copy that fails part of the way through
+        def failing_copy_file_range(source, target, count, *args):
+            if calls:
+                raise OSError("Failure")
+
+            calls.append(count)
+
+            return os.write(target, os.read(source, 1000))
+
+        os.copy_file_range, transom_main.fcntl = failing_copy_file_range, None
+
+        try:
+            transom_main.clone_file("a.bin", "b.bin")
+        finally:
+            if copy_file_range is None:
+                del os.copy_file_range
+            else:
+                os.copy_file_range = copy_file_range
+
+            transom_main.fcntl = fcntl
+
+        assert calls
+        assert read("b.bin") == read("a.bin")
+
+@test
+def site_render_unchanged_outputs():
+    for strategy in ("copy", "hardlink", "reflink", "symlink"):
+        with empty_test_site() as site:
+            write("config/site.py", f"site.copy_strategy = \"{strategy}\"\n")
+            write("input/index.md", "# Top\n")
+            write("input/data.bin", "abc")
+
+            site.render()
+
+            assert read("output/data.bin") == "abc", read("output/data.bin")
+
+            if strategy == "hardlink":
+                assert os.path.samefile("input/data.bin", "output/data.bin")
+
+            if strategy == "symlink":
+                assert os.path.islink("output/data.bin")
+
+            mtimes = {x: os.lstat(join("output", x)).st_mtime_ns for x in ("index.html", "data.bin")}
+
+            site.render(force=True)
+
+            for path, mtime in mtimes.items():
+                assert os.lstat(join("output", path)).st_mtime_ns == mtime, path
+
+            write("input/data.bin", "xyz")
+
+            site.render()
+
+            assert read("output/data.bin") == "xyz", read("output/data.bin")
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.copy_strategy = \"teleport\"\n")
+        write("input/data.bin", "abc")
+
+        with expect_exception(TransomError):
+            site.render()
+
+@test
+def site_template_cache():
+    with empty_test_site() as site:
+        write("config/body.html", "<main>@content@</main><footer>@content@</footer>")
+        write("config/aside.html", "{{page.title}}")
+        write("input/a.md", "---\npage.title = \"A\"\n---\n{{render_template('config/aside.html')}}\n")
+        write("input/b.md", "---\npage.title = \"B\"\n---\n{{render_template('config/aside.html')}}\n")
+
+        site.render()
+
+        result = read("output/a.html")
+        assert result == "<main><p>A</p>\n</main><footer><p>A</p>\n</footer>", result
+
+        result = read("output/b.html")
+        assert result == "<main><p>B</p>\n</main><footer><p>B</p>\n</footer>", result
+
+        layout = site.template_cache.load_layout("config/page.html", "config/body.html")
+        assert site.template_cache.load_layout("config/page.html", "config/body.html") is layout
+        assert len(layout) == 3, layout
+
+        template = site.template_cache.load_template("config/aside.html")
+        assert site.template_cache.load_template("config/aside.html") is template
+
+        write("config/body.html", "<main>@content@</main>")
+
+        assert site.template_cache.load_layout("config/page.html", "config/body.html") is not layout
+
+        site.render()
+
+        result = read("output/a.html")
+        assert result == "<main><p>A</p>\n</main>", result
+
+@test
+def site_render_processes():
+    with standard_test_site_dir():
+        with TransomSite(".", threads=2) as site:
+            site.render()
+
+        expected = {x: read(x) for x in find("output", "*.html")}
+
+        remove("output")
+
+        with TransomSite(".", threads=2, workers="process") as site:
+            site.render()
+
+            for path, text in expected.items():
+                assert read(path) == text, path
+
+            check_file("output/site.css")
+
+            # Nothing changed
+            site.render()
+
+            touch("input/outer/inner/nested.md")
+
+            site.render()
+
+    with empty_test_site_dir():
+        write("input/index.md", "# Top\n")
+        write("input/broken.md", "{{1 / 0}}")
+
+        with TransomSite(".", threads=2, workers="process") as site:
+            with expect_exception(TransomError):
+                site.render()
+
+    with empty_test_site_dir():
+        write("input/index.md", "# Top\n")
+
+        call_transom_command(["render", "--workers", "process", "--threads", "2"])
+
+        check_file("output/index.html")
+
+@test
+def site_render_compression():
+    with empty_test_site_dir():
+        write("config/site.py", "site.compression = [\"gzip\"]\n")
+        write("input/index.md", "# Top\n\n" + lipsum(500))
+        write("input/small.txt", "Small\n")
+        write("input/image.png", "x" * 2000)
+
+        with TransomSite(".") as site:
+            site.render()
+
+            with gzip.open("output/index.html.gz", "rt") as f:
+                assert f.read() == read("output/index.html")
+
+            assert not exists("output/small.txt.gz")
+            assert not exists("output/image.png.gz")
+
+            # Unchanged outputs keep their compressed copies
+            mtime = os.stat("output/index.html.gz").st_mtime_ns
+
+            site.render(force=True)
+
+            assert os.stat("output/index.html.gz").st_mtime_ns == mtime
+
+            write("input/index.md", "# Changed\n\n" + lipsum(500))
+
+            site.render()
+
+            with gzip.open("output/index.html.gz", "rt") as f:
+                assert "Changed" in f.read()
+
+            # Copies of files that shrink below the threshold go away
+            write("input/index.md", "# Small\n")
+
+            site.render()
+
+            assert not exists("output/index.html.gz")
+
+        with TransomSite(".", threads=2, workers="process") as site:
+            write("input/index.md", "# Processes\n\n" + lipsum(500))
+
+            site.render()
+
+            with gzip.open("output/index.html.gz", "rt") as f:
+                assert "Processes" in f.read()
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.compression = [\"lzma\"]\n")
+        write("input/index.md", "# Top\n")
+
+        with expect_exception(TransomError, contains="lzma"):
+            site.render()
+
+@test
+def site_render_bundles():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.bundles = {\"assets/bundle.css\": [\"config/a.css\", \"config/b.css\"], "
+                                    "\"bundle.js\": [\"config/a.js\", \"config/b.js\"]}\n")
+            write("config/a.css", "@charset \"utf-8\";\n@import url(\"https://example.net/font.css\");\n"
+                                  "@import \"parts/c.css\";\n@import url(parts/d.css) layer(x) supports(display: grid) print;\n"
+                                  "a { color: red; }\n")
+            write("config/b.css", "@import 'parts/c.css';\nb { color: blue; }\n")
+            write("config/parts/c.css", "c { color: green; }\n")
+            write("config/parts/d.css", "d { color: gray; }\n")
+            write("config/a.js", "const a = 1\n")
+            write("config/b.js", "(() => a)()\n")
+            write("config/other.css", "e {}\n")
+            write("input/index.html", "<p>Index</p>")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                result = read("output/assets/bundle.css")
+                assert result == ("@import url(\"https://example.net/font.css\");\n"
+                                  "c { color: green; }\n"
+                                  "@layer x {\n@supports (display: grid) {\n@media print {\nd { color: gray; }\n}\n}\n}\n"
+                                  "a { color: red; }\n\n"
+                                  "b { color: blue; }\n"), result
+
+                result = read("output/bundle.js")
+                assert result == "const a = 1\n;\n(() => a)()\n", result
+
+                # Only a changed member renders a bundle again
+                write("config/other.css", "f {}\n")
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+
+                write("config/parts/c.css", "c { color: black; }\n")
+
+                site.render()
+
+                names = [get_base_name(x.output_path) for x in site.modified_files]
+                assert names == ["bundle.css"], names
+                assert "c { color: black; }" in read("output/assets/bundle.css")
+
+    # Relative URLs are rebased for the location of the bundle
+    with empty_test_site() as site:
+        write("config/site.py", "site.bundles = {\"css/bundle.css\": [\"input/styles/site.css\"]}\n")
+        write("input/styles/site.css", "@import \"parts/a.css\";\n"
+                                       "b { background: url(\"../images/b.png\"), url(/c.png), url(data:,d); }\n")
+        write("input/styles/parts/a.css", "a { background: url(a.png); }\n")
+        write("input/index.html", "<p>Index</p>")
+
+        site.render()
+
+        result = read("output/css/bundle.css")
+        assert result == ("a { background: url(../styles/parts/a.png); }\n"
+                          "b { background: url(\"../images/b.png\"), url(/c.png), url(data:,d); }\n"), result
+
+    # Bundles alone don't make a site
+    with empty_test_site() as site:
+        write("config/site.py", "site.bundles = {\"bundle.css\": [\"config/a.css\"]}\n")
+        write("config/a.css", "a {}\n")
+
+        assert site.render() == []
+        assert not exists("output/bundle.css")
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.bundles = {\"bundle.css\": [\"config/missing.css\"]}\n")
+        write("input/index.html", "<p>Index</p>")
+
+        with expect_exception(TransomError):
+            site.render()
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.bundles = {\"bundle.txt\": []}\n")
+        write("input/index.html", "<p>Index</p>")
+
+        with expect_exception(TransomError, contains="bundle.txt"):
+            site.render()
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.bundles = {\"site.css\": []}\n")
+        write("input/site.css", "a {}\n")
+
+        with expect_exception(TransomError, contains="conflicts"):
+            site.render()
+
+@test
+def site_render_search_index():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.search_index = True\n")
+            write("input/index.md", "---\npage.title = \"Home\"\n---\n\nWelcome to the Café\n")
+            write("input/alpha.md", "---\npage.title = \"Alpha\"\n---\n\nThe quick brown fox {{lipsum(1)}} jumps\n")
+            write("input/beta.html", "<h1>Beta</h1><p>A brown dog &amp; fox</p><script>let hidden;</script>")
+            write("input/site.css", "body { color: brown; }\n")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                pages = read_json("output/_transom/search/pages.json")
+                ids = {v[1]: int(k) for k, v in pages.items()}
+                alpha_beta_ids = sorted((ids["Alpha"], ids["Beta"]))
+
+                assert sorted(pages.values()) == [["/alpha.html", "Alpha"], ["/beta.html", "Beta"],
+                                                  ["/index.html", "Home"]], pages
+
+                result = read_json("output/_transom/search/br.json")
+                assert result == {"brown": [alpha_beta_ids[0], 1, alpha_beta_ids[1], 1]}, result
+
+                assert read_json("output/_transom/search/ca.json") == {"cafe": [ids["Home"], 1]}
+                assert read_json("output/_transom/search/al.json") == {"alpha": [ids["Alpha"], 10]}
+                assert not exists("output/_transom/search/hi.json")
+                assert not exists("output/_transom/search/li.json")
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+
+                # Only the changed page is indexed again, and pages keep
+                # their IDs
+                write("input/alpha.md", "# Alpha\n\nThe quick red fox\n")
+
+                site.render()
+
+                assert read_json("output/_transom/search/br.json") == {"brown": [ids["Beta"], 1]}
+                assert read_json("output/_transom/search/re.json") == {"red": [ids["Alpha"], 1]}
+                assert read_json("output/_transom/search/fo.json") == {"fox": [alpha_beta_ids[0], 1, alpha_beta_ids[1], 1]}
+
+                # A removed page takes its postings with it
+                remove("input/beta.html")
+
+                site.render()
+
+                assert not exists("output/_transom/search/do.json")
+                result = read_json("output/_transom/search/pages.json")
+                assert sorted(result) == sorted(str(ids[x]) for x in ("Alpha", "Home")), result
+
+                # Pages missing from the index are rendered again
+                remove(".transom/output/search.json")
+
+                site.render()
+
+                assert len(site.modified_files) == 2, site.modified_files
+
+                pages = read_json("output/_transom/search/pages.json")
+                home_id = next(int(k) for k, v in pages.items() if v[1] == "Home")
+
+                assert read_json("output/_transom/search/ca.json") == {"cafe": [home_id, 1]}
+
+    # The search component finds the index from the location of the
+    # site script, so sites can include it as is
+    with standard_test_site() as site:
+        site.render()
+
+        result = read("output/site.js")
+        assert "new URL(\"_transom/search\", transomSiteScriptUrl)" in result, result
+        assert "{{" not in result, result
+
+@test
+def site_render_pruning():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.compression = [\"gzip\"]\nsite.fingerprinted_files = [\"*.css\"]\n")
+            write("input/index.md", "# Index\n")
+            write("input/old.md", "# Old\n")
+            write("input/a/b/page.md", f"# Page\n\n{lipsum(500)}\n")
+            write("input/a/b/style.css", f"/* {lipsum(500)} */\n")
+            write("output/CNAME", "example.org\n")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                fingerprinted = read_json(".transom/output/assets.json")["assets"]["a/b/style.css"]
+
+                check_file("output/a/b/page.html.gz")
+                check_file(join("output", fingerprinted + ".gz"))
+
+                # A renamed input leaves only its new output
+                move("input/old.md", "input/new.md")
+
+                site.render()
+
+                assert [get_base_name(x.output_path) for x in site.modified_files] == ["new.html"]
+                assert not exists("output/old.html")
+                check_file("output/new.html")
+
+                remove("input/a")
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+                assert not exists("output/a"), list_dir("output/a")
+                assert read_json(".transom/output/assets.json")["assets"] == {}
+
+                check_file("output/index.html")
+                check_file("output/CNAME")
+
+@test
+def site_render_sitemaps():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.url = \"https://example.org\"\nsite.prefix = \"/docs\"\n"
+                                    "site.sitemap = True\nsite.feeds = [\"blog\"]\n")
+            write("input/index.md", "---\npage.title = \"Home\"\n---\n\nHome\n")
+            write("input/site.css", "body {}\n")
+            write("input/blog/index.md", "---\npage.title = \"Blog\"\n---\n\nPosts\n")
+            write("input/blog/one.md", "---\npage.title = \"One\"\n---\n\nOne\n")
+            write("input/blog/two.html", "<h1>Two &amp; <em>more</em></h1>")
+
+            os.utime("input/blog/one.md", ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+
+            ns = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+            atom = "{http://www.w3.org/2005/Atom}"
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                sitemap = XML(read("output/sitemap.xml"))
+                urls = [x.find(f"{ns}loc").text for x in sitemap]
+
+                assert urls == ["https://example.org/docs/blog/index.html", "https://example.org/docs/blog/one.html",
+                                "https://example.org/docs/blog/two.html", "https://example.org/docs/index.html"], urls
+                assert sitemap[1].find(f"{ns}lastmod").text == "2023-11-14T22:13:20Z"
+
+                feed = XML(read("output/blog/feed.xml"))
+                titles = [x.find(f"{atom}title").text for x in feed.iter(f"{atom}entry")]
+
+                assert feed.find(f"{atom}title").text == "Blog"
+                assert feed.find(f"{atom}id").text == "https://example.org/docs/blog/feed.xml"
+                assert titles == ["Two & more", "One"], titles
+
+                # Nothing is written again if no page has changed
+                sitemap_mtime = os.stat("output/sitemap.xml").st_mtime_ns
+                os.utime("output/blog/feed.xml", ns=(0, 0))
+
+                site.render()
+
+                assert os.stat("output/sitemap.xml").st_mtime_ns == sitemap_mtime
+                assert os.stat("output/blog/feed.xml").st_mtime_ns == 0
+
+                remove("input/blog/one.md")
+
+                site.render()
+
+                assert "one.html" not in read("output/sitemap.xml")
+                assert "One" not in read("output/blog/feed.xml")
+
+                # Large sitemaps are split into parts
+                site._SITEMAP_SIZE = 2
+                write("input/index.md", "---\npage.title = \"Home\"\n---\n\nHome again\n")
+
+                site.render()
+
+                sitemap = XML(read("output/sitemap.xml"))
+                parts = [x.find(f"{ns}loc").text for x in sitemap]
+
+                assert sitemap.tag == f"{ns}sitemapindex", sitemap.tag
+                assert parts == ["https://example.org/docs/sitemap-1.xml", "https://example.org/docs/sitemap-2.xml"], parts
+                assert len(XML(read("output/sitemap-2.xml"))) == 1
+
+                site._SITEMAP_SIZE = 50_000
+                write("input/index.md", "---\npage.title = \"Home\"\n---\n\nHome\n")
+
+                site.render()
+
+                assert XML(read("output/sitemap.xml")).tag == f"{ns}urlset"
+                assert not exists("output/sitemap-1.xml")
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.sitemap = True\n")
+        write("input/index.md", "Index\n")
+
+        with expect_exception(TransomError, contains="site.url"):
+            site.render()
+
+@test
+def site_check_links():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.prefix = \"/docs\"\n")
+            write("input/index.md", "# Index\n\n[A](a/index.html) [B](a/#b-heading) [C](missing.html)\n\n"
+                                    "[D](https://example.net/) [E](#index) [F](#nope) [G](/docs/a/) [H](/other/)\n")
+            write("input/a/index.md", "## B heading\n\n[Up](../index.html#index) [Gone](../a/b.html#x)\n")
+            write("input/a/page.html", "<!-- <a href=\"x.html\"> -->\n<script>let a = '<a href=\"y.html\">';</script>\n"
+                                       "<img src=\"../pixel.png\"/>\n<a name=\"here\" href=\"?q=1#here\">Here</a>")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                result = [(os.path.relpath(x[0], "output"), *x[1:]) for x in site.check_links()]
+                assert result == [("a/index.html", 2, "../a/b.html#x", "Broken link"),
+                                  ("a/page.html", 3, "../pixel.png", "Broken link"),
+                                  ("index.html", 2, "missing.html", "Broken link"),
+                                  ("index.html", 3, "#nope", "Broken anchor")], result
+
+@test
+def site_render_fingerprinting():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.fingerprinted_files = [\"*.css\"]\n")
+            write("input/site.css", "body { color: red; }\n")
+            write("input/index.html", "<link href=\"{{asset_url('site.css')}}\"/>{{asset_url('/other.html')}}")
+            write("input/other.html", "<p>Other</p>")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                manifest = read_json(".transom/output/assets.json")["assets"]
+                fingerprinted = manifest["site.css"]
+
+                assert fingerprinted.startswith("site.") and fingerprinted.endswith(".css"), manifest
+                assert read(join("output", fingerprinted)) == read("output/site.css")
+                assert read("output/index.html") == f"<link href=\"/{fingerprinted}\"/>/other.html"
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+
+                # A changed asset renders its pages again
+                write("input/site.css", "body { color: blue; }\n")
+
+                site.render()
+
+                names = sorted(get_base_name(x.output_path) for x in site.modified_files)
+                assert names == ["index.html", "site.css"], names
+
+                new_fingerprinted = read_json(".transom/output/assets.json")["assets"]["site.css"]
+
+                assert new_fingerprinted != fingerprinted, new_fingerprinted
+                assert not exists(join("output", fingerprinted))
+                assert read(join("output", new_fingerprinted)) == "body { color: blue; }\n"
+                assert f"/{new_fingerprinted}" in read("output/index.html")
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+
+@test
+def site_render_fingerprinting_asset_urls():
+    for workers in ("thread", "process"):
+        with empty_test_site_dir():
+            write("config/site.py", "site.fingerprinted_files = [\"*.css\"]\n")
+            write("input/a.css", "@import url(\"{{asset_url('b.css')}}\");\n")
+            write("input/b.css", "@import url(\"{{asset_url('c.css')}}\");\n")
+            write("input/c.css", "body { color: red; }\n")
+            write("input/index.html", "<link href=\"{{asset_url('a.css')}}\"/>")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                manifest = read_json(".transom/output/assets.json")["assets"]
+
+                assert read("output/b.css") == f"@import url(\"/{manifest['c.css']}\");\n"
+                assert read("output/a.css") == f"@import url(\"/{manifest['b.css']}\");\n"
+                assert read("output/index.html") == f"<link href=\"/{manifest['a.css']}\"/>"
+
+                site.render()
+
+                assert not site.modified_files, site.modified_files
+
+                # A change at the end of the chain reaches its start
+                write("input/c.css", "body { color: blue; }\n")
+
+                site.render()
+
+                new_manifest = read_json(".transom/output/assets.json")["assets"]
+
+                assert all(new_manifest[x] != manifest[x] for x in ("a.css", "b.css", "c.css")), new_manifest
+                assert read("output/a.css") == f"@import url(\"/{new_manifest['b.css']}\");\n"
+                assert read("output/index.html") == f"<link href=\"/{new_manifest['a.css']}\"/>"
+
+@test
+def site_render_minify():
+    for workers in ("thread", "process"):
+        with standard_test_site_dir():
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                sizes = {x: len(read(x)) for x in ("output/index.html", "output/site.css", "output/site.js")}
+
+            append("config/site.py", "site.minify = True\n")
+
+            with TransomSite(".", threads=2, workers=workers) as site:
+                site.render()
+
+                for path, size in sizes.items():
+                    assert len(read(path)) < size, path
+
+                assert "<h1 id=\"transom-test\">Transom test</h1>" in read("output/index.html")
+                names = sorted(get_relative_path(x, "output") for x in site.minified_sizes)
+                expected = ["index.html", "outer/inner/index.html", "outer/inner/nested.html", "site.css", "site.js",
+                            "test-cases-1.html", "test-cases-2.html"]
+
+                assert names == expected, names
+                assert all(x[1] < x[0] for x in site.minified_sizes.values()), site.minified_sizes
+
+@test
+def site_render_profile():
+    with standard_test_site_dir():
+        call_transom_command(["render", "--profile-output", "profile.json"])
+
+        data = read_json("profile.json")
+
+        assert "load input files" in data["phases"], data["phases"]
+        assert "render" in data["phases"], data["phases"]
+        files = {get_base_name(x): y for x, y in data["files"].items()}
+
+        assert "markdown" in files["index.md"], files
+        assert "render" in files["site.css"], files
+        assert any(x.startswith("worker-thread-") for x in data["workers"]), data["workers"]
+        assert any(x["expression"] == "'path_nav()'" for x in data["expressions"]), data["expressions"]
+
+        call_transom_command(["render", "--force", "--profile", "--workers", "process", "--threads", "2"])
+
+    with empty_test_site_dir():
+        write("input/index.html", "{{1 + 1}}")
+
+        with TransomSite(".") as site:
+            site.profile = RenderProfile()
+            site.render()
+
+            assert site.profile.data()["expressions"][0]["count"] == 1, site.profile.data()
+
+@test
+def site_serve():
+    for server in ("thread", "async"):
+        with empty_test_site() as site:
+            with test_server(site, server):
+                with expect_exception():
+                    http_get("http://localhost:9191/")
+
+        with standard_test_site() as site:
+            with test_server(site, server):
+                http_get("http://localhost:9191/")
+                http_get("http://localhost:9191/site.css")
+                http_get("http://localhost:9191/outer/inner/nested.html")
+
+        with empty_test_site() as site:
+            with test_server(site, server):
+                write("input/outer/inner/new-file.html", "<html/>")
+
+                http_get("http://localhost:9191/outer/inner/new-file.html")
+
+        with empty_test_site() as site:
+            with test_server(site, server):
+                write("input/broken-file.md", "{{1 / 0}}")
+
+                with expect_error():
+                    http_get("http://localhost:9191/broken-file.html")
+
+        with empty_test_site() as site:
+            write("config/site.py", "site.prefix = \"/prefix\"\n")
+            write("input/index.md", "# Test\n")
+
+            with test_server(site, server):
+                http_get("http://localhost:9191/")
+                http_get("http://localhost:9191/prefix/")
+
+@test
+def site_serve_path_traversal():
+    for server in ("thread", "async"):
+        with empty_test_site() as site:
+            write("input/index.md", "# Top\n")
+            write("secret.txt", "Secret")
+
+            with test_server(site, server):
+                conn = HTTPConnection("localhost", 9191, timeout=10)
+
+                try:
+                    for path in ("/" + get_absolute_path("secret.txt"), "/../secret.txt", "/%2e%2e/secret.txt",
+                                 "/a/../../secret.txt", "/..%2fsecret.txt"):
+                        conn.request("GET", path)
+                        response = conn.getresponse()
+                        body = response.read()
+
+                        assert response.status == 404, (server, path, response.status)
+                        assert b"Secret" not in body, (server, path, body)
+
+                    # Empty and "." segments are dropped
+                    conn.request("GET", "//./index.html")
+                    response = conn.getresponse()
+                    response.read()
+
+                    assert response.status == 200, (server, response.status)
+                finally:
+                    conn.close()
+
+@test
+def site_serve_caching():
+    for server in ("thread", "async"):
+        with standard_test_site() as site:
+            write("config/site.py", "site.cache_control = {\"*.css\": \"max-age=60\", \"*\": \"no-store\"}\n")
+
+            with test_server(site, server):
+                conn = HTTPConnection("localhost", 9191, timeout=10)
+
+                try:
+                    conn.request("GET", "/site.css")
+                    response = conn.getresponse()
+                    response.read()
+
+                    etag = response.getheader("ETag")
+
+                    assert response.getheader("Cache-Control") == "max-age=60", response.getheader("Cache-Control")
+                    assert response.getheader("Last-Modified"), response.getheaders()
+                finally:
+                    conn.close()
+
+                for headers in ({"If-None-Match": etag}, {"If-None-Match": f"\"other\", {etag}"},
+                                {"If-None-Match": "*"}):
+                    conn = HTTPConnection("localhost", 9191, timeout=10)
+
+                    try:
+                        conn.request("GET", "/site.css", headers=headers)
+                        response = conn.getresponse()
+
+                        assert response.status == 304, (headers, response.status)
+                        assert response.getheader("ETag") == etag, response.getheaders()
+                    finally:
+                        conn.close()
+
+                conn = HTTPConnection("localhost", 9191, timeout=10)
+
+                try:
+                    conn.request("GET", "/index.html")
+                    response = conn.getresponse()
+                    response.read()
+
+                    assert response.getheader("Cache-Control") == "no-store", response.getheader("Cache-Control")
+
+                    # The tag changes with the content
+                    write("input/site.css", "body { color: red; }\n")
+
+                    conn.request("GET", "/site.css", headers={"If-None-Match": etag})
+                    response = conn.getresponse()
+
+                    assert response.status == 200, response.status
+                    assert response.read() == b"body { color: red; }\n"
+                    assert response.getheader("ETag") != etag, response.getheaders()
+                finally:
+                    conn.close()
+
+@test
+def site_serve_compression():
+    for server in ("thread", "async"):
+        with empty_test_site() as site:
+            write("config/site.py", "site.compression = [\"gzip\"]\n")
+            write("input/index.md", "# Top\n\n" + lipsum(500))
+
+            with test_server(site, server):
+                conn = HTTPConnection("localhost", 9191, timeout=10)
+
+                try:
+                    conn.request("GET", "/index.html", headers={"Accept-Encoding": "br, gzip"})
+                    response = conn.getresponse()
+                    body = response.read()
+
+                    assert response.getheader("Content-Encoding") == "gzip", response.getheaders()
+                    assert response.getheader("Content-Type") == "text/html", response.getheaders()
+                    assert response.getheader("Vary") == "Accept-Encoding", response.getheaders()
+                    assert gzip.decompress(body).decode() == read("output/index.html")
+
+                    etag = response.getheader("ETag")
+
+                    conn.request("GET", "/index.html", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+                    response = conn.getresponse()
+                    response.read()
+
+                    assert response.status == 304, response.status
+
+                    for accept_encoding in ("identity", "gzip;q=0"):
+                        conn.request("GET", "/index.html", headers={"Accept-Encoding": accept_encoding})
+                        response = conn.getresponse()
+
+                        assert response.getheader("Content-Encoding") is None, response.getheaders()
+                        assert response.read().decode() == read("output/index.html")
+                        assert response.getheader("ETag") != etag, response.getheaders()
+                finally:
+                    conn.close()
+
+@test
+def site_serve_async():
+    with standard_test_site() as site:
+        with test_server(site, "async"):
+            conn = HTTPConnection("localhost", 9191, timeout=10)
+
+            try:
+                # Several requests on one keep-alive connection
+                for path in ("/", "/site.css", "/outer/inner/nested.html", "/pixel.png"):
+                    conn.request("GET", path)
+                    response = conn.getresponse()
+
+                    assert response.status == 200, (path, response.status)
+                    with open(join("output", path.removeprefix("/") or "index.html"), "rb") as f:
+                        assert response.read() == f.read(), path
+
+                conn.request("HEAD", "/site.css")
+                response = conn.getresponse()
+
+                assert response.status == 200, response.status
+                assert response.getheader("Content-Type") == "text/css", response.getheader("Content-Type")
+                assert response.read() == b""
+
+                conn.request("GET", "/outer")
+                response = conn.getresponse()
+                response.read()
+
+                assert response.status == 301, response.status
+                assert response.getheader("Location") == "/outer/", response.getheader("Location")
+
+                conn.request("GET", "/no-such-file.html")
+                response = conn.getresponse()
+                response.read()
+
+                assert response.status == 404, response.status
+
+                # Validators and cache policy
+                conn.request("GET", "/site.css")
+                response = conn.getresponse()
+                response.read()
+
+                etag = response.getheader("ETag")
+                last_modified = response.getheader("Last-Modified")
+
+                assert etag, etag
+                assert response.getheader("Cache-Control") == "no-cache", response.getheader("Cache-Control")
+
+                conn.request("GET", "/site.css", headers={"If-None-Match": etag})
+                response = conn.getresponse()
+
+                assert response.status == 304, response.status
+                assert response.read() == b""
+
+                conn.request("GET", "/site.css", headers={"If-Modified-Since": last_modified})
+                response = conn.getresponse()
+                response.read()
+
+                assert response.status == 304, response.status
+
+                conn.request("GET", "/site.css", headers={"If-None-Match": "\"other\"",
+                                                          "If-Modified-Since": last_modified})
+                response = conn.getresponse()
+                response.read()
+
+                assert response.status == 200, response.status
+
+                # A page edited just before the request is rendered first
+                write("input/outer/inner/nested.md", "# Edited\n")
+
+                conn.request("GET", "/outer/inner/nested.html")
+                response = conn.getresponse()
+
+                assert b"Edited" in response.read()
+            finally:
+                conn.close()
+
+@test
+def site_serve_watch():
+    for polling in (False, True):
+        with empty_test_site() as site:
+            watcher = FileWatcher(site, polling=polling)
+
+            try:
+                assert not watcher.check()
+
+                write("input/outer/index.md", "# Outer\n")
+
+                assert watcher.check()
+                assert not watcher.check()
+
+                write("input/outer/inner/new.md", "# New\n")
+
+                assert watcher.check()
+            finally:
+                watcher.close()
+
+    # An unexpected error doesn't stop the watcher thread, and a
+    # request right after an edit gets the new page
+    with empty_test_site() as site:
+        write("input/index.md", "# Top\n")
+
+        render, failures = site.render, []
+
+        def failing_render(*args, **kwargs):
+            if not failures:
+                failures.append(True)
+                raise RuntimeError("Failure")
+
+            return render(*args, **kwargs)
 
         with test_server(site):
-            http_get("http://localhost:9191/")
-            http_get("http://localhost:9191/prefix/")
+            site.render = failing_render
+
+            write("input/index.md", "# Failed\n")
+
+            for i in range(100):
+                if failures:
+                    break
+
+                sleep(0.05)
+
+            assert failures
+
+            write("input/index.md", "# Recovered\n")
+
+            result = http_get("http://localhost:9191/index.html")
+            assert "Recovered" in result, result
+
+    # Background rebuild and live reload
+    for server_mode in ("thread", "async"):
+        with empty_test_site() as site:
+            write("input/index.md", "# Top\n")
+
+            server = threading.Thread(target=site.serve,
+                                      kwargs={"port": 9191, "live_reload": True, "server": server_mode})
+            server.start()
+
+            await_port(9191)
+
+            try:
+                result = http_get("http://localhost:9191/index.html")
+                assert "new EventSource" in result, result
+
+                conn = HTTPConnection("localhost", 9191, timeout=10)
+                conn.request("GET", "/_transom/reload")
+                response = conn.getresponse()
+
+                write("input/index.md", "# Changed\n")
+
+                # The watcher can see the write before it is complete,
+                # so more than one render may follow
+                for i in range(10):
+                    line = response.readline()
+
+                    if line.strip():
+                        assert line.startswith(b"data: "), line
+                        assert "/index.html" in json.loads(line[6:]), line
+
+                        if "Changed" in read("output/index.html"):
+                            break
+
+                assert "Changed" in read("output/index.html"), read("output/index.html")
+
+                conn.close()
+            finally:
+                http_post("http://localhost:9191/STOP", "please")
+                server.join()
 
 @test
 def site_code_execution():
@@ -279,6 +1391,39 @@ def template_code_execution():
         with expect_exception(TransomError):
             site.render()
 
+@test
+def template_compilation():
+    site = types.SimpleNamespace(profile=None)
+    page = types.SimpleNamespace(site=site, input_path="test.html", variables={"x": 1})
+
+    result = "".join(Template("a {{x + 1}} {{{x}}} {{(y for y in 'bc')}} {{None}} {{x # Comment}}").render(page))
+    assert result == "a 2 {{x}} bc None 1", result
+
+    result = "".join(Template("").render(page))
+    assert result == "", result
+
+    # A tuple expression is one result
+    result = "".join(Template("{{x, 2}} {{x, 3 # Comment}}").render(page))
+    assert result == "(1, 2) (1, 3)", result
+
+    # Names bound with := are page variables, before and after the
+    # binding
+    result = "".join(Template("{{x}} {{(x := 5) + 1}} {{x}} {{[(z := y) for y in 'ab']}} {{z}}").render(page))
+    assert result == "1 6 5 ['a', 'b'] b", result
+    assert page.variables["x"] == 5 and page.variables["z"] == "b", page.variables
+
+    with expect_exception(TransomError, contains="'1 / 0'"):
+        "".join(Template("a {{x}}\nb {{1 / 0}} c").render(page))
+
+    with expect_exception(TransomError, contains="'1 / 0'"):
+        "".join(Template("{{(w := 1)}} {{1 / 0}}").render(page))
+
+    with expect_exception(TransomError, contains="')('"):
+        Template("a {{x}} {{)(}}")
+
+    with expect_exception(TransomError, contains="'(1 / y for y in (0,))'"):
+        "".join(Template("{{x}} {{(1 / y for y in (0,))}}").render(page))
+
 @test
 def command_options():
     run("transom --help")
@@ -357,7 +1502,24 @@ def command_render():
         assert "<h1 id=\"transom-test\">Transom test</h1>" in result, result
 
         call_transom_command(["render", "--quiet"])
-        call_transom_command(["render", "--force"])
+        call_transom_command(["render", "--force", "--check-links"])
+
+@test
+def command_check_links():
+    run("transom check-links --help")
+
+    with empty_test_site_dir():
+        copy(join(TRANSOM_HOME, "sites/test"), ".", inside=False, symlinks=False)
+
+        call_transom_command(["render"])
+        call_transom_command(["check-links"])
+
+        write("input/broken.html", "<a href=\"missing.html\">Missing</a>")
+
+        call_transom_command(["render"])
+
+        with expect_system_exit():
+            call_transom_command(["check-links"])
 
 @test
 def command_serve():
@@ -380,10 +1542,28 @@ def command_serve():
         with expect_system_exit():
             call_transom_command(["serve", "--port", "9191"])
 
+        with expect_system_exit():
+            call_transom_command(["serve", "--port", "9191", "--server", "async"])
+
         http_post("http://localhost:9191/STOP", "please")
 
         server.join()
 
+    # Shutting down a server running in the main thread of its process
+    for server in ("thread", "async"):
+        with empty_test_site_dir():
+            write("input/index.md", "# Top\n")
+
+            proc = start(f"transom serve --port 9191 --server {server}")
+
+            try:
+                await_port(9191)
+                http_post("http://localhost:9191/STOP", "please")
+            finally:
+                wait(proc, timeout=30)
+
+            assert proc.exit_code == 0, (server, proc.exit_code)
+
 @test
 def function_lipsum():
     result = lipsum(0, end="")
@@ -436,6 +1616,115 @@ def function_html_table():
 
         XML(html_table_csv("test.csv"))
 
+@test
+def function_minify():
+    result = minify_css("a , b > c {\n  color: red ;\n  width: calc(1px + 2px);\n}\n/* Comment */ "
+                        "d { content: \"a  /* b */ ;\"; background: url(x  y.png) }\n/*! Keep */")
+    assert result == ("a,b>c{color:red;width:calc(1px + 2px)}d{content:\"a  /* b */ ;\";background:url(x  y.png)}"
+                      "/*! Keep */"), result
+
+    result = minify_js("var a = \"x // y\";  // Comment\n\n  var re = /a\\/[/]b/g; x = a / b / c;\n"
+                       "var t = `a ${ {x: 1}.x } // ${\"}\"}`;\n/* Comment */ y = 1 .toString() + - -2;\n"
+                       "return /x/.test(s)\na\n++b")
+    assert result == ("var a= \"x // y\";\nvar re= /a\\/[/]b/g;x=a/b/c;\nvar t= `a ${ {x: 1}.x } // ${\"}\"}`;\n"
+                      "y=1 .toString() + - -2;\nreturn/x/.test(s)\na\n++b"), result
+
+    result = minify_html("<p>\n  A  <b title=\"x > y\">b</b> <!-- Comment -->c\n</p>\n"
+                         "<pre>  x\n  y</pre>\n<style> a { color: red } </style>\n"
+                         "<script>\n  // Comment\n  x = 1\n</script>\n<script type=\"text/plain\"> x  y </script>\n")
+    assert result == ("<p>\nA <b title=\"x > y\">b</b> c\n</p>\n<pre>  x\n  y</pre>\n<style>a{color:red}</style>\n"
+                      "<script>x=1</script>\n<script type=\"text/plain\"> x  y </script>\n"), result
+
+@test
+def function_markdown_blocks():
+    markdown = MarkdownLocal.INSTANCE.convert
+    blocks = MarkdownBlocks()
+
+    for site in ("sites/project", "sites/test"):
+        for path in find(join(TRANSOM_HOME, site), "*.md"):
+            text = read(path)
+            assert blocks.convert(text) == markdown(text), path
+
+    text = ("# Title\n\nSee [the docs][docs].\n\n- a\n\n- b\n\n```\nx\n\ny\n```\n\n"
+            "Term\n: Definition\n\nOther\n: Definition\n\n<pre>\n\n</pre>\n\nEnd\n\n[docs]: /docs.html\n")
+
+    result = split_markdown(text)
+    assert result == ["# Title\n\n", "See [the docs][docs].\n\n- a\n\n- b\n\n", "```\nx\n\ny\n```\n\n",
+                      "Term\n: Definition\n\nOther\n: Definition\n\n", "<pre>\n\n</pre>\n\n", "End\n\n",
+                      "[docs]: /docs.html\n"], result
+
+    result = blocks.convert(text)
+    assert result == markdown(text), result
+    assert "<a href=\"/docs.html\">the docs</a>" in result[0], result
+
+    # Only the changed segment is converted again
+    count = len(blocks.results)
+    result, _ = blocks.convert(text.replace("End", "The end"))
+
+    assert len(blocks.results) == count + 1, blocks.results
+    assert "<p>The end</p>" in result, result
+
+    # A changed reference link definition applies to every segment
+    result, _ = blocks.convert(text.replace("/docs.html", "/other.html"))
+    assert "<a href=\"/other.html\">the docs</a>" in result, result
+
+@test
+def function_markdown_headings():
+    text = "# Setup\n\n## Install\n\nText\n\n## Install\n\n### Install `x`\n\n## Install\n"
+    html, headings = MarkdownLocal.INSTANCE.convert(text)
+
+    assert headings == ((1, "setup", "Setup"), (2, "install", "Install"), (2, "install-1", "Install"),
+                        (3, "install-codexcode", "Install <code>x</code>"), (2, "install-2", "Install")), headings
+    assert "<h2 id=\"install-2\">Install</h2>" in html, html
+
+    # Ids don't carry over from one conversion to the next
+    assert MarkdownLocal.INSTANCE.convert("## Install\n")[1] == ((2, "install", "Install"),)
+
+    # Cached segments are given unique ids too
+    blocks = MarkdownBlocks()
+
+    assert blocks.convert(text) == (html, headings)
+    assert blocks.convert(text) == (html, headings)
+    assert blocks.convert(text + "\n## Setup\n")[1][-1] == (2, "setup-1", "Setup")
+
+    with empty_test_site() as site:
+        write("input/index.md", "{{toc_nav()}}\n\n" + text)
+        write("input/deep.md", "---\npage.title = \"Deep\"\n---\n\n{{toc_nav(levels=3)}}\n\n" + text)
+
+        site.render()
+
+        result = read("output/index.html")
+        assert "<a href=\"#setup\">Setup</a><a href=\"#install\">Install</a>" in result, result
+        assert "<a href=\"#install-2\">Install</a></nav>" in result, result
+
+        result = read("output/deep.html")
+        assert "<a href=\"#install-codexcode\" class=\"level-3\">Install x</a>" in result, result
+
+@test
+def function_markdown_fast():
+    standard, fast = MarkdownLocal.INSTANCE.value, MarkdownLocal.FAST.value
+
+    for site in ("sites/project", "sites/test"):
+        for path in find(join(TRANSOM_HOME, site), "*.md"):
+            text = read(path)
+            assert fast(text) == standard(text), path
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.markdown_mode = \"fast\"\n")
+        write("input/index.md", "# Index\n\nSome *text*  \nand a [link](a.html).\n")
+
+        site.render()
+
+        result = read("output/index.html")
+        assert "<p>Some <em>text</em><br />\nand a <a href=\"a.html\">link</a>.</p>" in result, result
+
+    with empty_test_site() as site:
+        write("config/site.py", "site.markdown_mode = \"turbo\"\n")
+        write("input/index.md", "# Index\n")
+
+        with expect_exception(TransomError, contains="turbo"):
+            site.render()
+
 @test
 def plano_render():
     with standard_test_site_dir():